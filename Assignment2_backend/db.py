@@ -0,0 +1,28 @@
+"""
+db.py - Database connection helpers for Assignment2_backend.
+
+Used by the WSGI entry point to open connections before the first request arrives.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def prewarm_connections(aliases=None):
+    """
+    Opens a connection for each database alias so the first request of a worker
+    does not pay the TCP/TLS/auth handshake. The connection is only kept if
+    ``CONN_MAX_AGE`` allows reuse; failures are logged and left to the request path.
+    """
+    for alias in aliases or settings.DATABASES:
+        connection = connections[alias]
+        if connection.settings_dict.get('CONN_MAX_AGE') == 0:
+            continue
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.warning('Could not pre-warm database connection %r', alias, exc_info=True)
@@ -21,6 +21,12 @@ import sys
 from pathlib import Path
 import sys
 
+
+def env_flag(name, default=False):
+    # Reads a boolean switch from the environment ("1", "true", "yes", "on")
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,9 +61,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.InstrumentationMiddleware',
+    'blog.middleware.ReadYourWritesMiddleware',
+    'blog.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -92,23 +100,41 @@ WSGI_APPLICATION = 'Assignment2_backend.wsgi.app'
 
 DB_ENGINE = os.environ.get('DB_ENGINE', 'django.db.backends.postgresql_psycopg2')
 
+# Connection reuse: keep connections open for DB_CONN_MAX_AGE seconds ("None" for
+# unlimited, 0 to close after every request). Defaults to 0 on Vercel, which sets
+# VERCEL in its runtime: frozen lambdas would hold their connections open and use up
+# the database's connection limit. Long-running servers keep connections for 60s.
+# Health checks make a reused connection that the pooler dropped reconnect quietly.
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '0' if os.environ.get('VERCEL') else '60')
+DB_CONN_MAX_AGE = None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE)
+DB_CONN_HEALTH_CHECKS = env_flag('DB_CONN_HEALTH_CHECKS', True)
+# Open the database connection when a worker starts instead of on its first request
+DB_PREWARM_CONNECTIONS = env_flag('DB_PREWARM_CONNECTIONS', False)
+
 if DB_ENGINE == 'django.db.backends.sqlite3':
     DATABASES = {
         'default': {
             'ENGINE': DB_ENGINE,
             'NAME': os.environ.get('DB_NAME', BASE_DIR / "db.sqlite3"),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
         }
     }
 else:
+    DB_HOST = os.environ.get('DB_HOST', 'ep-curly-lake-a7ywuelp-pooler.ap-southeast-2.aws.neon.tech')
     DATABASES = {
         'default': {
             'ENGINE': DB_ENGINE,
             'NAME': os.environ.get('DB_NAME', 'neondb'),
             'USER': os.environ.get('DB_USER', 'neondb_owner'),
             'PASSWORD': os.environ.get('DB_PASSWORD', 'npg_l6chXBMGq9EU'),
-            'HOST': os.environ.get('DB_HOST', 'ep-curly-lake-a7ywuelp-pooler.ap-southeast-2.aws.neon.tech'),
+            'HOST': DB_HOST,
             'PORT': os.environ.get('DB_PORT', '5432'),
-            'CONN_MAX_AGE': 0,
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+            # Server-side cursors (QuerySet.iterator()) do not survive a
+            # transaction-pooling proxy such as Neon's -pooler endpoints
+            'DISABLE_SERVER_SIDE_CURSORS': env_flag('DB_DISABLE_SERVER_SIDE_CURSORS', '-pooler' in DB_HOST),
             'OPTIONS': {
                 'connect_timeout': 10,
                 'sslmode': 'require',
@@ -119,6 +145,33 @@ else:
         }
     }
 
+# Read replicas: one alias (replica1, replica2, ...) per entry of DB_REPLICA_HOSTS, or
+# of DB_REPLICA_NAMES for SQLite files; DB_REPLICA_USER/PASSWORD/PORT override the
+# primary's. blog.routers.PrimaryReplicaRouter sends blog reads to them in turn and
+# keeps a client on the primary for PIN_SECONDS after it writes (PIN_CACHE must be
+# shared between workers).
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+DB_REPLICA_NAMES = [name.strip() for name in os.environ.get('DB_REPLICA_NAMES', '').split(',') if name.strip()]
+DB_REPLICAS = []
+for _index in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    _replica = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if _index < len(DB_REPLICA_HOSTS):
+        _replica['HOST'] = DB_REPLICA_HOSTS[_index]
+    if _index < len(DB_REPLICA_NAMES):
+        _replica['NAME'] = DB_REPLICA_NAMES[_index]
+    for _key in ('USER', 'PASSWORD', 'PORT'):
+        if os.environ.get(f'DB_REPLICA_{_key}'):
+            _replica[_key] = os.environ[f'DB_REPLICA_{_key}']
+    DATABASES[f'replica{_index + 1}'] = _replica
+    DB_REPLICAS.append(f'replica{_index + 1}')
+
+DATABASE_ROUTERS = ['blog.routers.PrimaryReplicaRouter']
+BLOG_DB_ROUTING = {
+    'REPLICAS': DB_REPLICAS,
+    'PIN_SECONDS': int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5)),
+    'PIN_CACHE': os.environ.get('DB_REPLICA_PIN_CACHE', 'default'),
+}
+
 if 'test' in sys.argv or 'test_coverage' in sys.argv:
     # Use SQLite for tests to avoid Postgres test DB conflicts
     DATABASES['default'] = {
@@ -145,6 +198,45 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing. PASSWORD_HASHER picks the algorithm for new and rehashed
+# passwords (pbkdf2, scrypt, or argon2 which needs argon2-cffi); the others stay
+# listed so existing hashes keep verifying and are rehashed on the next login.
+_TUNED_PASSWORD_HASHERS = {
+    'pbkdf2': 'blog.hashers.TunedPBKDF2PasswordHasher',
+    'scrypt': 'blog.hashers.TunedScryptPasswordHasher',
+    'argon2': 'blog.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [_TUNED_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _TUNED_PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+BLOG_PASSWORD_HASHING = {
+    'PBKDF2_ITERATIONS': int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000)),
+    'SCRYPT_WORK_FACTOR': int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'SCRYPT_BLOCK_SIZE': int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8)),
+    'SCRYPT_PARALLELISM': int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1)),
+    'ARGON2_TIME_COST': int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400)),
+    'ARGON2_PARALLELISM': int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8)),
+}
+
+# Password hashing for register and login runs on a pool of WORKERS threads (the
+# hashers release the GIL) with at most MAX_QUEUE jobs waiting; beyond that those
+# endpoints answer 503 at once instead of queueing behind an auth storm.
+BLOG_HASHING_POOL = {
+    'ENABLED': env_flag('BLOG_HASHING_POOL', True),
+    'WORKERS': int(os.environ.get('BLOG_HASHING_WORKERS', min(4, os.cpu_count() or 1))),
+    'MAX_QUEUE': int(os.environ.get('BLOG_HASHING_MAX_QUEUE', 16)),
+}
+
+# Loads the user's auth token in the same query as the user on login
+AUTHENTICATION_BACKENDS = ['blog.backends.TokenModelBackend']
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -169,7 +261,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'blog.authentication.ExpiringTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -177,3 +269,140 @@ REST_FRAMEWORK = {
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Cache framework, local memory by default. Point CACHE_BACKEND/CACHE_LOCATION at
+# e.g. django.core.cache.backends.redis.RedisCache to share caches between workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Read-through cache of serialized post lists, invalidated by blog.signals. On by
+# default only with a cache shared between workers: with a per-process cache such as
+# LocMemCache a write on one worker leaves the others serving the old lists.
+_SHARED_CACHE_CONFIGURED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+BLOG_LIST_CACHE = {
+    'ENABLED': env_flag('BLOG_LIST_CACHE_ENABLED', _SHARED_CACHE_CONFIGURED),
+    'ALIAS': os.environ.get('BLOG_LIST_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('BLOG_LIST_CACHE_TIMEOUT', 300)),
+}
+
+# Keyset pagination for the blog post list (?cursor= / ?page_size=)
+BLOG_PAGE_SIZE = int(os.environ.get('BLOG_PAGE_SIZE', 20))
+BLOG_MAX_PAGE_SIZE = int(os.environ.get('BLOG_MAX_PAGE_SIZE', 100))
+
+# Use the native async list/create/like views from blog.async_views. Only worth it
+# under an ASGI server (e.g. uvicorn Assignment2_backend.asgi:application).
+BLOG_ASYNC_VIEWS = env_flag('BLOG_ASYNC_VIEWS', False)
+
+# Per-request instrumentation (Server-Timing headers and /api/_metrics). The metrics
+# are served to staff users, and to scrapers sending "Authorization: Bearer <TOKEN>"
+# when TOKEN is set.
+BLOG_METRICS = {
+    'ENABLED': env_flag('BLOG_METRICS_ENABLED', True),
+    'SAMPLE_RATE': float(os.environ.get('BLOG_METRICS_SAMPLE_RATE', 1.0)),
+    'SERVER_TIMING': env_flag('BLOG_METRICS_SERVER_TIMING', True),
+    'TOKEN': os.environ.get('BLOG_METRICS_TOKEN', ''),
+}
+
+# Batch post creation (/api/create/batch/)
+BLOG_BATCH_CREATE = {
+    'MAX_SIZE': int(os.environ.get('BLOG_BATCH_CREATE_MAX_SIZE', 5000)),
+    'CHUNK_SIZE': int(os.environ.get('BLOG_BATCH_CREATE_CHUNK_SIZE', 500)),
+}
+
+# Failed-login throttle, checked before any password hashing (0 disables it)
+BLOG_LOGIN_THROTTLE = {
+    'MAX_FAILURES': int(os.environ.get('BLOG_LOGIN_MAX_FAILURES', 5)),
+    'WINDOW': int(os.environ.get('BLOG_LOGIN_FAILURE_WINDOW', 300)),
+    'ALIAS': 'default',
+}
+
+# Token -> user cache used by CachedTokenAuthentication. Set BLOG_TOKEN_CACHE_ALIAS
+# to a CACHES alias shared between workers (e.g. Redis) to cache tokens for TTL
+# seconds; logouts then take effect on every worker at once. Without one, each worker
+# caches tokens for LOCAL_TTL seconds only (0 disables): a logout applies at once on
+# the worker that handled it and within LOCAL_TTL on the others.
+# BLOG_TOKEN_CACHE_TRUST_LOCAL keeps local entries for the full TTL instead.
+BLOG_TOKEN_CACHE = {
+    'MAX_SIZE': int(os.environ.get('BLOG_TOKEN_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('BLOG_TOKEN_CACHE_TTL', 300)),
+    'SHARED_CACHE': os.environ.get('BLOG_TOKEN_CACHE_ALIAS') or None,
+    'TRUST_LOCAL': env_flag('BLOG_TOKEN_CACHE_TRUST_LOCAL', False),
+    'LOCAL_TTL': int(os.environ.get('BLOG_TOKEN_CACHE_LOCAL_TTL', 5)),
+}
+
+# Response compression (blog.middleware.CompressionMiddleware): zstd and br are used
+# when the zstandard / brotli packages are installed, gzip otherwise. Bodies smaller
+# than MIN_SIZE bytes are sent as they are.
+BLOG_COMPRESSION = {
+    'ENABLED': env_flag('BLOG_COMPRESSION_ENABLED', True),
+    'MIN_SIZE': int(os.environ.get('BLOG_COMPRESSION_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': int(os.environ.get('BLOG_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.environ.get('BLOG_BROTLI_QUALITY', 5)),
+    'ZSTD_LEVEL': int(os.environ.get('BLOG_ZSTD_LEVEL', 3)),
+}
+
+# Streaming export of a user's posts (blog.export): rows are fetched CHUNK_SIZE at a
+# time and written out in chunks of about BUFFER_SIZE bytes.
+BLOG_EXPORT = {
+    'CHUNK_SIZE': int(os.environ.get('BLOG_EXPORT_CHUNK_SIZE', 2000)),
+    'BUFFER_SIZE': int(os.environ.get('BLOG_EXPORT_BUFFER_SIZE', 64 * 1024)),
+}
+
+# Read-only fast path for post lists (blog.fastpath): values_list() rows, a compiled
+# row-to-dict function and orjson rendering, with byte-identical responses.
+BLOG_FAST_PATH = {
+    'ENABLED': env_flag('BLOG_FAST_PATH', False),
+}
+
+# Global feed timeline (blog.feed): the newest SIZE post ids, kept in the ALIAS cache
+# and rebuilt from the database every TIMEOUT seconds. Like the list cache it is on
+# by default only with a shared cache: with a per-process cache each worker keeps its
+# own timeline and misses the posts created on the others. When off, the feed pages
+# through the database directly.
+BLOG_FEED = {
+    'ENABLED': env_flag('BLOG_FEED_ENABLED', _SHARED_CACHE_CONFIGURED),
+    'ALIAS': os.environ.get('BLOG_FEED_CACHE_ALIAS', 'default'),
+    'SIZE': int(os.environ.get('BLOG_FEED_SIZE', 500)),
+    'TIMEOUT': int(os.environ.get('BLOG_FEED_TIMEOUT', 300)),
+}
+
+# Write-behind like buffer (blog.likebuffer): toggles are journaled in memory and
+# written in batches every INTERVAL seconds or at MAX_PENDING changes. Pending likes
+# are overlaid on this process's reads; a crash loses at most one interval of them.
+BLOG_LIKE_BUFFER = {
+    'ENABLED': env_flag('BLOG_LIKE_BUFFER', False),
+    'MAX_PENDING': int(os.environ.get('BLOG_LIKE_BUFFER_MAX_PENDING', 10000)),
+    'INTERVAL': float(os.environ.get('BLOG_LIKE_BUFFER_INTERVAL', 1.0)),
+}
+
+# Server-sent events stream (blog.events, served at /api/events/ under ASGI). The
+# in-process BACKEND only reaches streams of the same worker; with several workers
+# use blog.events.RedisBroker and REDIS_URL. Each stream queues at most QUEUE_SIZE
+# events, the last BUFFER_SIZE events can be replayed with Last-Event-ID, and idle
+# streams get a comment every HEARTBEAT seconds. Streams end after MAX_AGE seconds
+# (clients reconnect and resume), so ones whose client left unnoticed are released.
+BLOG_EVENTS = {
+    'ENABLED': env_flag('BLOG_EVENTS_ENABLED', True),
+    'BACKEND': os.environ.get('BLOG_EVENTS_BACKEND', 'blog.events.InProcessBroker'),
+    'REDIS_URL': os.environ.get('BLOG_EVENTS_REDIS_URL'),
+    'BUFFER_SIZE': int(os.environ.get('BLOG_EVENTS_BUFFER_SIZE', 1000)),
+    'QUEUE_SIZE': int(os.environ.get('BLOG_EVENTS_QUEUE_SIZE', 100)),
+    'MAX_SUBSCRIBERS': int(os.environ.get('BLOG_EVENTS_MAX_SUBSCRIBERS', 10000)),
+    'HEARTBEAT': int(os.environ.get('BLOG_EVENTS_HEARTBEAT', 15)),
+    'MAX_AGE': int(os.environ.get('BLOG_EVENTS_MAX_AGE', 300)),
+    'RETRY': 3000,
+}
+
+# Sliding token expiry for ExpiringTokenAuthentication: tokens unused for TTL seconds
+# stop working (0 disables expiry); renewals are written at most once per
+# RENEW_INTERVAL. Run `manage.py purge_expired_tokens` periodically.
+BLOG_TOKEN_EXPIRY = {
+    'TTL': int(os.environ.get('BLOG_TOKEN_TTL', 14 * 24 * 3600)),
+    'RENEW_INTERVAL': int(os.environ.get('BLOG_TOKEN_RENEW_INTERVAL', 3600)),
+}
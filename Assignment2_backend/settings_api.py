@@ -0,0 +1,42 @@
+"""
+settings_api.py - Lean settings profile for the token-authenticated blog API.
+
+Select it with DJANGO_SETTINGS_MODULE=Assignment2_backend.settings_api, e.g. for
+serverless deploys where every cold start imports the project from scratch. It
+keeps everything from settings.py except the parts the API never uses: the admin,
+sessions, messages, CSRF, templates, static files, django-filter and DRF's
+browsable API. Check the effect with `python manage.py bench_startup`.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'corsheaders',
+    'blog.apps.BlogConfig',
+]
+
+# Token authentication needs no sessions, CSRF or AuthenticationMiddleware: DRF and
+# the async views set request.user themselves
+MIDDLEWARE = [
+    'blog.middleware.InstrumentationMiddleware',
+    'blog.middleware.ReadYourWritesMiddleware',
+    'blog.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+ROOT_URLCONF = 'Assignment2_backend.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_FILTER_BACKENDS': [],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
@@ -0,0 +1,9 @@
+"""
+urls_api.py - URL configuration for the lean API settings profile (settings_api):
+the blog API without the admin site.
+"""
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/', include('blog.urls')),
+]
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Assignment2_backend.settings')
 
 app = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.DB_PREWARM_CONNECTIONS:
+    from Assignment2_backend.db import prewarm_connections
+
+    prewarm_connections()
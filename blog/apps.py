@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_sqlite_fts(sender, **kwargs):
+    # Imported on migrate, so blog.search stays out of the request path's startup
+    from .search import install_sqlite_fts
+    install_sqlite_fts(sender, **kwargs)
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Register signal handlers
+        from . import instrumentation, signals  # noqa: F401
+
+        post_migrate.connect(install_sqlite_fts, sender=self)
@@ -0,0 +1,275 @@
+# async_views.py - Native async variants of the hot blog API endpoints for ASGI
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.http.multipartparser import MultiPartParserError
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from . import conditional, fastpath, hashing, likebuffer
+from .authentication import ExpiringTokenAuthentication
+from .backends import TokenModelBackend
+from .cache import PostListCache
+from .models import BlogPost
+from .pagination import KeysetPagination
+from .serializers import BlogPostSerializer, LoginSerializer, RegisterSerializer, build_user, defer_unrequested, \
+    get_login_token, get_requested_fields, serialize_posts
+from .throttling import LoginFailureThrottle
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    # Rendered by DRF's JSONRenderer so the bytes match the sync views
+    renderer = fastpath.FastJSONRenderer() if fastpath.is_enabled() else JSONRenderer()
+    return HttpResponse(renderer.render(data), status=status_code, headers=headers,
+                        content_type='application/json')
+
+
+async def aget_liked_post_ids(user, post_ids):
+    # Async counterpart of serializers.get_liked_post_ids
+    if not post_ids:
+        return set()
+    Like = BlogPost.likes.through
+    liked = Like.objects.filter(user_id=user.pk, blogpost_id__in=post_ids).values_list('blogpost_id', flat=True)
+    return likebuffer.overlay_liked_post_ids(user, post_ids, {post_id async for post_id in liked})
+
+
+async def aserialize_posts(posts, request, fields=None):
+    liked_post_ids = await aget_liked_post_ids(request.user, [post.pk for post in posts])
+    context = {'request': request, 'liked_post_ids': liked_post_ids}
+    return serialize_posts(posts, fields, context)
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of DRF's APIView: authenticates the token (from the
+    token cache, or the async ORM on a miss), requires an authenticated user and
+    hands the request to an async handler. Under ASGI these views never leave the
+    event loop except for the like toggle, which needs a transaction. Views with
+    ``authentication_class = None`` are public and skip authentication.
+    """
+    authentication_class = ExpiringTokenAuthentication
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated API, exempt from CSRF like DRF's APIView
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.query_params = request.GET
+        if self.authentication_class is None:
+            request.user, request.auth = AnonymousUser(), None
+            return await super().dispatch(request, *args, **kwargs)
+
+        authenticator = self.authentication_class()
+        try:
+            credentials = await authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            return self.unauthorized(authenticator, exc.detail)
+        if credentials is None:
+            return self.unauthorized(authenticator, exceptions.NotAuthenticated.default_detail)
+
+        request.user, request.auth = credentials
+        return await super().dispatch(request, *args, **kwargs)
+
+    def unauthorized(self, authenticator, detail):
+        return json_response({'detail': detail}, status_code=status.HTTP_401_UNAUTHORIZED,
+                             headers={'WWW-Authenticate': authenticator.authenticate_header(self.request)})
+
+
+def read_data(request):
+    """
+    Parses the body like DRF's default parsers: JSON, or a urlencoded or multipart
+    form. Returns (data, None), or (None, error response) for a body that does not
+    parse.
+    """
+    if request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        try:
+            return request.POST, None
+        except MultiPartParserError as exc:
+            return None, json_response({'detail': f'Multipart form parse error - {exc}'},
+                                       status_code=status.HTTP_400_BAD_REQUEST)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError as exc:
+        return None, json_response({'detail': f'JSON parse error - {exc}'}, status_code=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(data, dict):
+        return None, json_response({'non_field_errors': ['Invalid data. Expected a dictionary.']},
+                                   status_code=status.HTTP_400_BAD_REQUEST)
+    return data, None
+
+
+def busy_response(exc):
+    return json_response({'detail': exc.detail}, status_code=exc.status_code, headers={'Retry-After': str(exc.wait)})
+
+
+class AsyncRegisterView(AsyncAPIView):
+    """
+    Async version of RegisterView: the password is hashed in the hashing pool while
+    the event loop keeps serving other requests.
+    """
+    authentication_class = None
+
+    async def post(self, request):
+        data, error = read_data(request)
+        if error is not None:
+            return error
+        serializer = RegisterSerializer(data=data)
+        # The unique username check queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            return json_response(serializer.errors, status_code=status.HTTP_400_BAD_REQUEST)
+        try:
+            encoded_password = await hashing.amake_password(serializer.validated_data['password'])
+        except hashing.HashingBusy as exc:
+            return busy_response(exc)
+        serializer.instance = build_user(serializer.validated_data, encoded_password)
+        await serializer.instance.asave()
+        return json_response(serializer.data, status_code=status.HTTP_201_CREATED)
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    Async version of LoginView, verifying the password in the hashing pool.
+    """
+    authentication_class = None
+
+    async def post(self, request):
+        data, error = read_data(request)
+        if error is not None:
+            return error
+        username = str(data.get('username', ''))
+        throttle = LoginFailureThrottle()
+        if throttle.is_blocked(username):
+            return json_response({'detail': 'Too many failed login attempts. Try again later.'},
+                                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                 headers={'Retry-After': str(throttle.window)})
+
+        try:
+            # Field validation only; the credentials are checked below without blocking the loop
+            credentials = LoginSerializer().to_internal_value(data)
+        except exceptions.ValidationError as exc:
+            return json_response(exc.detail, status_code=status.HTTP_400_BAD_REQUEST)
+        try:
+            user = await TokenModelBackend().aauthenticate(request, **credentials)
+        except hashing.HashingBusy as exc:
+            return busy_response(exc)
+        if user is None:
+            throttle.record_failure(username)
+            return json_response({'non_field_errors': ['Invalid username or password']},
+                                 status_code=status.HTTP_400_BAD_REQUEST)
+        throttle.reset(username)
+        token = await sync_to_async(get_login_token)(user)
+        return json_response({'token': token.key})
+
+
+class AsyncBlogPostListView(AsyncAPIView):
+    """
+    Async version of BlogPostListView, with the same pagination, caching and ETags.
+    """
+    pagination_class = KeysetPagination
+
+    async def get(self, request):
+        try:
+            fields = get_requested_fields(request)
+        except exceptions.ValidationError as exc:
+            return json_response(exc.detail, status_code=status.HTTP_400_BAD_REQUEST)
+        if not settings.BLOG_LIST_CACHE['ENABLED']:
+            if conditional.has_conditions(request):
+                etag, last_modified = await conditional.aget_validators(
+                    self.get_validation_queryset(request), request)
+                not_modified = conditional.not_modified(request, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+            data, (etag, last_modified) = await self.get_list_data(request, fields)
+            return conditional.set_validators(json_response(data), etag, last_modified)
+
+        list_cache = await PostListCache.acreate(request)
+        not_modified = conditional.not_modified(request, list_cache.etag, list_cache.last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = await list_cache.aget()
+        if data is None:
+            data, _ = await self.get_list_data(request, fields)
+            await list_cache.aset(data)
+        return conditional.set_validators(json_response(data), list_cache.etag, list_cache.last_modified)
+
+    def get_validation_queryset(self, request):
+        blog_posts = BlogPost.objects.filter(author=request.user)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            return paginator.get_page_queryset(blog_posts, request)
+        return blog_posts
+
+    async def get_list_data(self, request, fields=None):
+        # Returns (data, validators) like BlogPostListView.get_list_data
+        blog_posts = defer_unrequested(BlogPost.objects.filter(author=request.user), fields)
+        if fastpath.is_enabled():
+            return await self.get_fast_list_data(blog_posts, request, fields)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            rows = [post async for post in paginator.get_page_queryset(blog_posts, request)]
+            page = paginator.finalize_page(rows)
+            data = paginator.get_paginated_data(await aserialize_posts(page, request, fields))
+            return data, conditional.get_row_validators(paginator.window, request)
+
+        posts = [post async for post in blog_posts]
+        return await aserialize_posts(posts, request, fields), conditional.get_row_validators(posts, request)
+
+    async def get_fast_list_data(self, blog_posts, request, fields=None):
+        # Async counterpart of fastpath.get_list_data
+        row_serializer = fastpath.get_row_serializer(fields)
+        paginator = fastpath.FastKeysetPagination(row_serializer)
+        paginated = paginator.is_requested(request)
+        if paginated:
+            rows = [row async for row in paginator.get_page_queryset(row_serializer.rows(blog_posts), request)]
+            rows = paginator.finalize_page(rows)
+            window = paginator.window
+        else:
+            rows = window = [row async for row in row_serializer.rows(blog_posts)]
+        liked_post_ids = await aget_liked_post_ids(request.user, row_serializer.row_ids(rows))
+        data = row_serializer.serialize(rows, liked_post_ids)
+        validators = conditional.get_row_validators(window, request, key=row_serializer.validator_key)
+        return (paginator.get_paginated_data(data) if paginated else data), validators
+
+
+class AsyncBlogPostCreateView(AsyncAPIView):
+    """
+    Async version of BlogPostCreateView. Accepts the same JSON and form bodies.
+    """
+
+    async def post(self, request):
+        data, error = read_data(request)
+        if error is not None:
+            return error
+        serializer = BlogPostSerializer(data=data)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status_code=status.HTTP_400_BAD_REQUEST)
+
+        post = await BlogPost.objects.acreate(author=request.user, **serializer.validated_data)
+        # A new post has no likes yet, so liked_by_me needs no lookup
+        context = {'request': request, 'liked_post_ids': set()}
+        return json_response(BlogPostSerializer(post, context=context).data, status_code=status.HTTP_201_CREATED)
+
+
+class AsyncLikePostView(AsyncAPIView):
+    """
+    Async version of LikePostView.
+    """
+
+    async def post(self, request, post_id):
+        try:
+            liked, like_count = await likebuffer.atoggle_like(post_id, request.user)
+        except BlogPost.DoesNotExist:
+            return json_response({'detail': 'Post not found.'}, status_code=status.HTTP_404_NOT_FOUND)
+
+        return json_response({
+            'status': 'post liked' if liked else 'post unliked',
+            'like_count': like_count,
+        })
+
@@ -0,0 +1,259 @@
+# authentication.py - Token authentication with an in-process token cache
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of token key -> Token (with its user) and a TTL per entry.
+
+    With a Django cache alias as the shared tier, every lookup makes one round trip
+    to it, fetching the token and its revocation marker together: a local hit saves
+    unpickling the token, and a token revoked on any worker (the signal handlers in
+    ``blog.signals`` set the marker) stops working everywhere at once.
+
+    Without a shared tier the in-process tier cannot hear about revocations made by
+    other workers, so its entries only live for ``local_ttl`` seconds: a token
+    revoked elsewhere keeps working here for at most that long, while revocations
+    on this worker apply at once. ``trust_local`` keeps them for the full ``ttl``.
+    """
+    key_prefix = 'blog:token:'
+    revoked_prefix = 'blog:token-revoked:'
+
+    def __init__(self, max_size=10000, ttl=300, shared_alias=None, trust_local=False, local_ttl=5):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.local_ttl = ttl if shared_alias or trust_local else local_ttl
+        self.local_enabled = self.local_ttl > 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def shared_key(self, key):
+        # Never put raw token keys into an external cache
+        return self.key_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def revoked_key(self, key):
+        return self.revoked_prefix + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        if self.shared is None:
+            return self.get_local(key)
+        return self._resolve(key, self.shared.get_many([self.shared_key(key), self.revoked_key(key)]))
+
+    def _resolve(self, key, found):
+        # Picks the token from a local hit or the shared tier, unless it was revoked
+        if found.get(self.revoked_key(key)):
+            self._discard(key)
+            return None
+        token = self.get_local(key)
+        if token is None:
+            token = found.get(self.shared_key(key))
+            if token is not None:
+                self._store(key, token, time.monotonic())
+        return token
+
+    def get_local(self, key):
+        if not self.local_enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        # Only called with a token just read from the database, so it is not revoked
+        self._store(key, token, time.monotonic())
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), token, self.ttl)
+            self.shared.delete(self.revoked_key(key))
+
+    async def aget(self, key):
+        # Only the shared tier does I/O, so it is the only part awaited
+        if self.shared is None:
+            return self.get_local(key)
+        return self._resolve(key, await self.shared.aget_many([self.shared_key(key), self.revoked_key(key)]))
+
+    async def aset(self, key, token):
+        self._store(key, token, time.monotonic())
+        if self.shared is not None:
+            await self.shared.aset(self.shared_key(key), token, self.ttl)
+            await self.shared.adelete(self.revoked_key(key))
+
+    def _store(self, key, token, now):
+        if not self.local_enabled:
+            return
+        with self._lock:
+            self._entries[key] = (token, now + self.local_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, key):
+        self._discard(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key(key))
+            # Outlives every local copy, whose TTL started no later than now
+            self.shared.set(self.revoked_key(key), True, self.ttl)
+
+    def invalidate_user(self, user_id):
+        # Drops every locally cached token of the user; returns the evicted keys
+        with self._lock:
+            keys = [key for key, (token, _) in self._entries.items() if token.user_id == user_id]
+            for key in keys:
+                del self._entries[key]
+        return keys
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        options = settings.BLOG_TOKEN_CACHE
+        _token_cache = TokenCache(
+            max_size=options.get('MAX_SIZE', 10000),
+            ttl=options.get('TTL', 300),
+            shared_alias=options.get('SHARED_CACHE', None),
+            trust_local=options.get('TRUST_LOCAL', False),
+            local_ttl=options.get('LOCAL_TTL', 5),
+        )
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    global _token_cache
+    if setting == 'BLOG_TOKEN_CACHE':
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for DRF's TokenAuthentication that serves repeat requests
+    from ``TokenCache``, so a cache hit authenticates without touching the database.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, token)
+        return token.user, token
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate()`` for the plain Django async views in
+        ``blog.async_views``; cache misses go through the async ORM.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = await cache.aget(key)
+        if token is None:
+            try:
+                token = await self.get_model().objects.select_related('user').aget(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            await cache.aset(key, token)
+        return token.user, token
+
+
+def get_token_expiry_state(token, now=None):
+    """
+    Returns ``'expired'``, ``'renew'`` or ``None`` for ``token`` under
+    ``BLOG_TOKEN_EXPIRY``. ``Token.created`` doubles as the last-renewed time.
+    """
+    options = settings.BLOG_TOKEN_EXPIRY
+    if not options['TTL']:
+        return None
+    age = ((now or timezone.now()) - token.created).total_seconds()
+    if age >= options['TTL']:
+        return 'expired'
+    if age >= options['RENEW_INTERVAL']:
+        return 'renew'
+    return None
+
+
+class ExpiringTokenAuthentication(CachedTokenAuthentication):
+    """
+    CachedTokenAuthentication with sliding expiry: a token unused for
+    ``BLOG_TOKEN_EXPIRY['TTL']`` seconds is deleted and rejected. Using a token pushes
+    its expiry forward, but the renewal is written at most once per
+    ``RENEW_INTERVAL``, so ordinary requests never write to the token table.
+    """
+    expired_message = _('Token has expired.')
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        now = timezone.now()
+        state = get_token_expiry_state(token, now)
+        if state == 'expired':
+            token.delete()
+            raise exceptions.AuthenticationFailed(self.expired_message)
+        if state == 'renew':
+            self.get_model().objects.filter(key=token.key).update(created=now)
+            token.created = now
+            get_token_cache().set(key, token)
+        return user, token
+
+    async def aauthenticate_credentials(self, key):
+        user, token = await super().aauthenticate_credentials(key)
+        now = timezone.now()
+        state = get_token_expiry_state(token, now)
+        if state == 'expired':
+            await token.adelete()
+            raise exceptions.AuthenticationFailed(self.expired_message)
+        if state == 'renew':
+            await self.get_model().objects.filter(key=token.key).aupdate(created=now)
+            token.created = now
+            await get_token_cache().aset(key, token)
+        return user, token
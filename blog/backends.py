@@ -0,0 +1,50 @@
+# backends.py - Authentication backends for the blog app
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+
+UserModel = get_user_model()
+
+
+class TokenModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's DRF auth token in the same query as the user,
+    so a login whose token already exists costs a single query. Hashing runs in the
+    bounded pool of ``blog.hashing``.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.select_related('auth_token').get(
+                **{UserModel.USERNAME_FIELD: username}
+            )
+        except UserModel.DoesNotExist:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user (#20760).
+            hashing.make_password(password)
+            return None
+        if hashing.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        # Async counterpart of authenticate() for the async login view
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.select_related('auth_token').aget(
+                **{UserModel.USERNAME_FIELD: username}
+            )
+        except UserModel.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        if await hashing.acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
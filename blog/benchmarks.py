@@ -0,0 +1,401 @@
+# benchmarks.py - Seeding, load generation and query budgets for the blog API
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import fastpath
+from .models import AuthorStats, BlogPost
+from .serializers import BlogPostSerializer
+
+BENCH_PASSWORD = 'bench-password-123'
+
+# Most queries a single request to each endpoint may run, token cache miss included.
+# Checked by the test suite and by ``manage.py bench_blog --check-budgets``. Writes
+# include the UPDATE of the author's AuthorStats row, and a create the transaction
+# (savepoint) around its INSERT and that UPDATE.
+QUERY_BUDGETS = {
+    'register': 2,
+    'login': 1,
+    'list': 3,
+    'list_page': 3,
+    'create': 5,
+    'like': 7,
+    'delete': 6,
+}
+
+ENDPOINTS = list(QUERY_BUDGETS)
+
+
+class Fixtures:
+    """
+    Seeded users, their tokens and posts, shared by all benchmark workers.
+    """
+
+    def __init__(self, prefix, users, tokens, posts_by_user):
+        self.prefix = prefix
+        self.users = users
+        self.tokens = tokens
+        self.posts_by_user = posts_by_user
+        self.post_ids = [post_id for post_ids in posts_by_user.values() for post_id in post_ids]
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_number(self):
+        return next(self._counter)
+
+    def pop_post(self, user):
+        # Each post can only be deleted once
+        with self._lock:
+            post_ids = self.posts_by_user.get(user.pk)
+            return post_ids.pop() if post_ids else None
+
+
+def seed(users=10, posts_per_user=100, likes_per_post=5, prefix='bench', batch_size=1000):
+    """
+    Creates ``users`` users (with tokens), ``posts_per_user`` posts each and up to
+    ``likes_per_post`` likes per post, all with bulk inserts, and returns Fixtures.
+    Every seeded user shares one precomputed password hash to keep seeding fast.
+    """
+    password = make_password(BENCH_PASSWORD)
+    run = f'{prefix}_{int(time.time())}'
+    with transaction.atomic():
+        seeded_users = User.objects.bulk_create(
+            [User(username=f'{run}_{i}', password=password) for i in range(users)], batch_size=batch_size
+        )
+        tokens = {
+            token.user_id: token.key
+            for token in Token.objects.bulk_create(
+                [Token(user=user, key=Token.generate_key()) for user in seeded_users], batch_size=batch_size
+            )
+        }
+
+        posts = [
+            BlogPost(title=f'Benchmark post {n}', content=f'Seeded content {n} ' * 20, author=user)
+            for user in seeded_users
+            for n in range(posts_per_user)
+        ]
+        for post in posts:
+            post.update_summary()
+        BlogPost.objects.bulk_create(posts, batch_size=batch_size)
+        posts_by_user = {user.pk: [] for user in seeded_users}
+        for post_id, author_id in BlogPost.objects.filter(author__in=seeded_users).values_list('id', 'author_id'):
+            posts_by_user[author_id].append(post_id)
+
+        Like = BlogPost.likes.through
+        rng = random.Random(0)
+        likes = []
+        for post_ids in posts_by_user.values():
+            for post_id in post_ids:
+                for user in rng.sample(seeded_users, min(likes_per_post, len(seeded_users))):
+                    likes.append(Like(blogpost_id=post_id, user_id=user.pk))
+        Like.objects.bulk_create(likes, batch_size=batch_size)
+        counts = Like.objects.filter(blogpost_id=OuterRef('pk')).order_by().values('blogpost_id').annotate(
+            total=Count('*')).values('total')
+        BlogPost.objects.filter(author__in=seeded_users).update(like_count=Coalesce(Subquery(counts), 0))
+        BlogPost.objects.filter(author__in=seeded_users).recompute_trending(batch_size=batch_size)
+        # The bulk inserts skip the signals that keep the stats, so /api/me/stats/ reads real rows
+        AuthorStats.objects.rebuild([user.pk for user in seeded_users])
+
+    return Fixtures(run, seeded_users, tokens, posts_by_user)
+
+
+def cleanup(fixtures):
+    # Deleting the users cascades to their tokens, posts and likes
+    User.objects.filter(username__startswith=f'{fixtures.prefix}_').delete()
+
+
+def build_request(endpoint, fixtures, rng):
+    """
+    Returns ``(method, url, data, token)`` for one request to ``endpoint``.
+    """
+    user = rng.choice(fixtures.users)
+    token = fixtures.tokens[user.pk]
+    number = fixtures.next_number()
+    if endpoint == 'register':
+        data = {'username': f'{fixtures.prefix}_new_{number}', 'password': BENCH_PASSWORD}
+        return 'post', reverse('register'), data, None
+    if endpoint == 'login':
+        return 'post', reverse('login'), {'username': user.username, 'password': BENCH_PASSWORD}, None
+    if endpoint == 'list':
+        return 'get', reverse('blog-post-list'), None, token
+    if endpoint == 'list_page':
+        return 'get', reverse('blog-post-list') + '?page_size=20', None, token
+    if endpoint == 'create':
+        return 'post', reverse('blog-post-create'), {'title': f'New post {number}', 'content': 'Body'}, token
+    if endpoint == 'like':
+        post_id = rng.choice(fixtures.post_ids)
+        return 'post', reverse('blog-post-like', kwargs={'post_id': post_id}), None, token
+    if endpoint == 'delete':
+        post_id = fixtures.pop_post(user)
+        if post_id is None:
+            return None
+        return 'delete', reverse('blog-post-delete', kwargs={'pk': post_id}), None, token
+    raise ValueError(f'Unknown endpoint {endpoint!r}')
+
+
+# Transaction control is not counted against query budgets
+TRANSACTION_STATEMENTS = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+def count_queries(captured_queries):
+    return sum(1 for query in captured_queries if not query['sql'].upper().startswith(TRANSACTION_STATEMENTS))
+
+
+def measure(client, method, url, data=None, token=None):
+    """
+    Sends one request and returns ``(status_code, seconds, queries)``.
+    """
+    if token:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    else:
+        client.credentials()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, method)(url, data, format='json')
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed, count_queries(queries.captured_queries)
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(seconds for _, seconds, _ in samples)
+    queries = [count for _, _, count in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for status_code, _, _ in samples if status_code >= 400),
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+def run_endpoint(endpoint, fixtures, requests=100, concurrency=4, seed=0):
+    """
+    Drives ``requests`` requests at ``endpoint`` from ``concurrency`` threads, each
+    with its own client and database connection, and returns the summary.
+    """
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(index, count):
+        client = APIClient()
+        rng = random.Random(seed * 1000 + index)
+        samples = []
+        try:
+            for _ in range(count):
+                request = build_request(endpoint, fixtures, rng)
+                if request is None:
+                    break
+                samples.append(measure(client, *request))
+        finally:
+            if concurrency > 1:
+                connection.close()
+        return samples
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = worker(0, requests)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(worker, i, count) for i, count in enumerate(per_worker)]
+            samples = [sample for future in futures for sample in future.result()]
+    return summarize(samples, time.perf_counter() - started)
+
+
+def benchmark_serialization(queryset, user, repeat=5):
+    """
+    Loads, serializes and renders ``queryset`` ``repeat`` times through the
+    ModelSerializer path and through ``blog.fastpath`` and returns the best rows/sec
+    of each, plus whether both produced the same bytes.
+    """
+    request = SimpleNamespace(user=user, query_params={}, build_absolute_uri=lambda: '/')
+
+    def model_serializer_path():
+        data = BlogPostSerializer(queryset.all(), many=True, context={'request': request}).data
+        return JSONRenderer().render(data)
+
+    def fast_path():
+        data, _ = fastpath.get_list_data(queryset.all(), request, paginate=False)
+        return fastpath.FastJSONRenderer().render(data)
+
+    rows = queryset.count()
+    results = {'rows': rows}
+    outputs = {}
+    for name, path in (('serializer', model_serializer_path), ('fast', fast_path)):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outputs[name] = path()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[f'{name}_rows_per_sec'] = round(rows / best, 1) if best else None
+    if results['serializer_rows_per_sec']:
+        results['speedup'] = round(results['fast_rows_per_sec'] / results['serializer_rows_per_sec'], 2)
+    results['identical'] = outputs['serializer'] == outputs['fast']
+    return results
+
+
+def run_benchmark(fixtures, endpoints=None, requests=100, concurrency=4):
+    results = {}
+    for endpoint in endpoints or ENDPOINTS:
+        results[endpoint] = run_endpoint(endpoint, fixtures, requests=requests, concurrency=concurrency)
+    return results
+
+
+def check_budgets(results, budgets=None):
+    """
+    Returns a list of ``(endpoint, max_queries, budget)`` for every endpoint whose
+    worst request ran more queries than its budget.
+    """
+    budgets = budgets or QUERY_BUDGETS
+    return [
+        (endpoint, result['max_queries'], budgets[endpoint])
+        for endpoint, result in results.items()
+        if endpoint in budgets and result['max_queries'] is not None and result['max_queries'] > budgets[endpoint]
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path, results, **meta):
+    report = {
+        'revision': git_revision(),
+        'timestamp': timezone.now().isoformat(),
+        'database': connection.vendor,
+        **meta,
+        'endpoints': results,
+    }
+    with open(path, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    return report
+
+
+# Modules a cold start is checked for; the lean profile must not load any but the first two
+STARTUP_WATCHED_MODULES = (
+    'django.contrib.admin', 'rest_framework.renderers',
+    'blog.admin', 'django.contrib.sessions', 'django.contrib.staticfiles', 'django_filters',
+    'orjson', 'blog.fastpath', 'blog.search', 'blog.feed', 'blog.async_views',
+)
+
+# Run in a fresh interpreter: loads the WSGI application like a serverless runtime
+# does, serves one GET to the path in argv[2] and reports as JSON. argv[1] is the
+# parent's time.time() at spawn, so time-to-first-response includes interpreter start.
+STARTUP_PROBE = """
+import json, sys, time
+from io import BytesIO
+loading = time.perf_counter()
+from Assignment2_backend.wsgi import app
+loaded = time.perf_counter()
+path, _, query = sys.argv[2].partition('?')
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+    'wsgi.errors': sys.stderr,
+}
+statuses = []
+b''.join(app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+from django.apps import apps
+print(json.dumps({
+    'first_response_ms': (time.time() - float(sys.argv[1])) * 1000,
+    'load_app_ms': (loaded - loading) * 1000,
+    'first_request_ms': (time.perf_counter() - loaded) * 1000,
+    'status': statuses[0],
+    'modules': len(sys.modules),
+    'apps': [config.name for config in apps.get_app_configs()],
+    'watched_modules': [name for name in WATCHED if name in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr, top=15):
+    """
+    Summarizes ``python -X importtime`` output: total import time and the ``top``
+    modules by cumulative time, in milliseconds.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    modules.sort(key=lambda module: module[2], reverse=True)
+    return {
+        'total_ms': round(sum(self_us for _, self_us, _ in modules) / 1000, 1),
+        'top': [{'module': name, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                for name, _, cumulative_us in modules[:top]],
+    }
+
+
+def run_startup_probe(settings_module, path, importtime=False):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+    code = f'WATCHED = {STARTUP_WATCHED_MODULES!r}\n' + STARTUP_PROBE
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', code, repr(time.time()), path]
+    process = subprocess.run(command, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+    if process.returncode:
+        raise RuntimeError(f'Startup probe failed for {settings_module}:\n{process.stderr[-2000:]}')
+    return json.loads(process.stdout.splitlines()[-1]), process.stderr
+
+
+def measure_startup(settings_module, path='/api/blogs/', runs=5, top=15):
+    """
+    Cold-starts the WSGI application under ``settings_module`` ``runs`` times and
+    reports the median time to the first response (and its parts), plus one
+    ``-X importtime`` run for the import breakdown. The default path answers 401
+    without touching the database, so only startup is measured.
+    """
+    samples = [run_startup_probe(settings_module, path)[0] for _ in range(runs)]
+    probe, stderr = run_startup_probe(settings_module, path, importtime=True)
+
+    def median(key):
+        values = sorted(sample[key] for sample in samples)
+        return round(percentile(values, 0.5), 1)
+
+    return {
+        'settings': settings_module,
+        'path': path,
+        'runs': runs,
+        'status': probe['status'],
+        'first_response_ms': median('first_response_ms'),
+        'load_app_ms': median('load_app_ms'),
+        'first_request_ms': median('first_request_ms'),
+        'modules': probe['modules'],
+        'apps': probe['apps'],
+        'watched_modules': probe['watched_modules'],
+        'imports': parse_importtime(stderr, top),
+    }
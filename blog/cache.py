@@ -0,0 +1,93 @@
+# cache.py - Versioned per-user cache of serialized blog post lists
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_list_cache():
+    return caches[settings.BLOG_LIST_CACHE['ALIAS']]
+
+
+def version_key(user_id):
+    return f'blog:posts:version:{user_id}'
+
+
+def get_list_version(user_id):
+    """
+    Returns the current list version for ``user_id``, creating one if needed.
+    Versions are nanosecond timestamps, so an evicted version never comes back and
+    resurrects entries cached under it.
+    """
+    cache = get_list_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), time.time_ns(), None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+async def aget_list_version(user_id):
+    # Async counterpart of get_list_version
+    cache = get_list_cache()
+    version = await cache.aget(version_key(user_id))
+    if version is None:
+        await cache.aadd(version_key(user_id), time.time_ns(), None)
+        version = await cache.aget(version_key(user_id))
+    return version
+
+
+def bump_list_version(*user_ids):
+    """
+    Makes every cached list (and ETag) of these users stale at once. Runs when the
+    current transaction commits, so a concurrent read cannot cache the old rows
+    under the new version, and a rolled back write changes nothing.
+    """
+    def bump():
+        version = time.time_ns()
+        get_list_cache().set_many({version_key(user_id): version for user_id in user_ids}, None)
+
+    transaction.on_commit(bump)
+
+
+class PostListCache:
+    """
+    Read-through cache entry for one user's post list request.
+
+    Entries are keyed by the user's list version plus the full request URL (page,
+    cursor, host), so any write to the user's posts bumps the version and makes
+    every cached variant unreachable without having to find and delete them.
+    Async views build it with ``acreate`` and use ``aget`` and ``aset``.
+    """
+
+    def __init__(self, request, version=None):
+        self.cache = get_list_cache()
+        self.timeout = settings.BLOG_LIST_CACHE.get('TIMEOUT', 300)
+        self.version = get_list_version(request.user.pk) if version is None else version
+        variant = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        self.key = f'blog:posts:list:{request.user.pk}:{self.version}:{variant}'
+        self.etag = f'"{self.version:x}-{variant[:16]}"'
+
+    @property
+    def last_modified(self):
+        # The version is the time of the user's last write, deletes and likes included
+        return datetime.fromtimestamp(self.version / 1e9, tz=timezone.utc)
+
+    def get(self):
+        return self.cache.get(self.key)
+
+    def set(self, data):
+        self.cache.set(self.key, data, self.timeout)
+
+    @classmethod
+    async def acreate(cls, request):
+        return cls(request, await aget_list_version(request.user.pk))
+
+    async def aget(self):
+        return await self.cache.aget(self.key)
+
+    async def aset(self, data):
+        await self.cache.aset(self.key, data, self.timeout)
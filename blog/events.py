@@ -0,0 +1,300 @@
+# events.py - Pub/sub of blog events for the server-sent events stream
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+try:
+    import redis
+except ImportError:  # optional, only RedisBroker needs it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+POST_CREATED = 'post-created'
+POST_DELETED = 'post-deleted'
+LIKE_COUNT_CHANGED = 'like-count-changed'
+
+
+class Event:
+    __slots__ = ('id', 'type', 'data')
+
+    def __init__(self, id, type, data):
+        self.id = id
+        self.type = type
+        self.data = data
+
+    def encode(self):
+        # One server-sent event, ready to write to the stream
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(",", ":"))}\n\n'
+
+    def to_json(self):
+        return json.dumps({'id': self.id, 'type': self.type, 'data': self.data})
+
+    @classmethod
+    def from_json(cls, message):
+        value = json.loads(message)
+        return cls(value['id'], value['type'], value['data'])
+
+
+class Subscription:
+    """
+    One stream's view of the broker: a bounded queue filled on the subscriber's
+    event loop. A subscriber that falls ``QUEUE_SIZE`` events behind is closed
+    rather than buffered without limit; it reconnects with ``Last-Event-ID`` and
+    catches up from the broker's buffer.
+    """
+    closed = object()
+
+    def __init__(self, broker, queue_size):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on self.loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Everything queued is stale now; make room for the close marker
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.closed)
+
+    async def get(self, timeout=None):
+        """
+        Returns the next event, None when ``timeout`` passes without one, or
+        ``Subscription.closed`` once the subscriber has overflowed.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class InProcessBroker:
+    """
+    Fans events out to the streams of this process. Events get increasing ids and
+    the last ``BUFFER_SIZE`` of them are kept, so a client reconnecting with
+    ``Last-Event-ID`` is replayed what it missed. ``publish`` may be called from any
+    thread; delivery hops onto each subscriber's event loop.
+
+    With several worker processes each broker only sees its own writes; use a
+    backend that relays events between processes, such as RedisBroker.
+    """
+
+    def __init__(self, buffer_size=1000, queue_size=100, max_subscribers=10000, **options):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.buffer = deque(maxlen=buffer_size)
+        self.subscribers = set()
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        self.last_id += 1
+        return self.last_id
+
+    def publish(self, type, data):
+        with self._lock:
+            event = Event(self.next_id(), type, data)
+        self.dispatch(event)
+        return event
+
+    def dispatch(self, event):
+        # Buffering and the subscriber snapshot share the lock with subscribe(), so a
+        # new subscriber gets each event exactly once: from the replay or the queue
+        with self._lock:
+            self.buffer.append(event)
+            self.last_id = max(self.last_id, event.id)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop is gone
+                self.unsubscribe(subscription)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Registers a subscriber; must be called on its event loop. Returns
+        ``(subscription, replay)``, where ``replay`` is the list of buffered events
+        after ``last_event_id``, or None when they are no longer all buffered.
+        """
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(self, self.queue_size)
+            self.subscribers.add(subscription)
+            replay = []
+            if last_event_id is not None:
+                replay = self.replay(last_event_id)
+        return subscription, replay
+
+    def replay(self, last_event_id):
+        if last_event_id > self.last_id:
+            # Ids from another process or before a restart
+            return None
+        oldest = self.buffer[0].id if self.buffer else self.last_id + 1
+        if last_event_id < oldest - 1:
+            return None
+        return [event for event in self.buffer if event.id > last_event_id]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Relays events between worker processes through Redis pub/sub. Ids come from one
+    Redis counter and every process receives every event, so buffers and
+    ``Last-Event-ID`` agree across workers. Needs the ``redis`` package and
+    ``BLOG_EVENTS['REDIS_URL']``.
+    """
+    channel = 'blog:events'
+    counter_key = 'blog:events:last-id'
+    max_backoff = 30
+
+    def __init__(self, redis_url=None, **options):
+        if redis is None:
+            raise ImportError('RedisBroker requires the redis package.')
+        super().__init__(**options)
+        self.client = redis.Redis.from_url(redis_url)
+        self._listener = None
+
+    def publish(self, type, data):
+        event = Event(self.client.incr(self.counter_key), type, data)
+        self.client.publish(self.channel, event.to_json())
+        return event
+
+    def subscribe(self, last_event_id=None):
+        self.start_listener()
+        return super().subscribe(last_event_id)
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self.listen, name='blog-events', daemon=True)
+                self._listener.start()
+
+    def listen(self):
+        """
+        Relays the channel to this process's subscribers. A lost connection is logged
+        and the subscription reopened with exponential backoff, and a malformed
+        message is logged and skipped, so one failure never silences every stream.
+        """
+        delay = 1
+        try:
+            while True:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(self.channel)
+                    delay = 1
+                    for message in pubsub.listen():
+                        try:
+                            event = Event.from_json(message['data'])
+                        except (KeyError, TypeError, ValueError):
+                            logger.exception('Skipping malformed event message')
+                            continue
+                        self.dispatch(event)
+                except Exception:
+                    logger.exception('Event listener lost its Redis subscription, retrying in %ss', delay)
+                else:
+                    logger.warning('Event listener subscription ended, retrying in %ss', delay)
+                pubsub.close()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+        finally:
+            # Lets start_listener() start a new one
+            with self._lock:
+                self._listener = None
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        options = settings.BLOG_EVENTS
+        _broker = import_string(options['BACKEND'])(
+            buffer_size=options.get('BUFFER_SIZE', 1000),
+            queue_size=options.get('QUEUE_SIZE', 100),
+            max_subscribers=options.get('MAX_SUBSCRIBERS', 10000),
+            redis_url=options.get('REDIS_URL'),
+        )
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'BLOG_EVENTS':
+        _broker = None
+
+
+def publish(type, data):
+    if settings.BLOG_EVENTS['ENABLED']:
+        get_broker().publish(type, data)
+
+
+def post_created_data(post):
+    return {'id': post.pk, 'author': post.author_id, 'title': post.title,
+            'created_at': post.created_at.isoformat() if post.created_at else None}
+
+
+async def stream(subscription, replay, heartbeat=15, max_age=None):
+    """
+    Yields the server-sent events for one subscriber: the replay (or a ``reset``
+    event when the missed events are gone), then live events, with a comment line
+    every ``heartbeat`` idle seconds. An idle stream is one suspended coroutine.
+
+    The stream ends after ``max_age`` seconds and the client reconnects with
+    ``Last-Event-ID``. Django does not notice a client that went away until a write
+    fails, which some servers never report, so this bounds how long an abandoned
+    stream holds its subscription.
+    """
+    deadline = time.monotonic() + max_age if max_age else None
+    try:
+        yield f'retry: {settings.BLOG_EVENTS.get("RETRY", 3000)}\n\n'
+        if replay is None:
+            # The client missed events that are no longer buffered and should reload
+            yield f'id: {subscription.broker.last_id}\nevent: reset\ndata: {{}}\n\n'
+        else:
+            for event in replay:
+                yield event.encode()
+        while True:
+            timeout = heartbeat
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = min(heartbeat, remaining)
+            event = await subscription.get(timeout)
+            if event is Subscription.closed:
+                return
+            if event is not None:
+                yield event.encode()
+            elif deadline is None or time.monotonic() < deadline:
+                yield ': keep-alive\n\n'
+    finally:
+        subscription.close()
@@ -0,0 +1,166 @@
+# export.py - Streams a user's posts as NDJSON or CSV
+import csv
+import json
+import zlib
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Q
+from django.utils import timezone
+
+from .fastpath import format_datetime
+from .models import BlogPost
+
+EXPORT_FIELDS = ('id', 'title', 'content', 'created_at', 'updated_at', 'like_count')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def format_row(row, tz):
+    row = list(row)
+    for name in DATETIME_FIELDS:
+        index = EXPORT_FIELDS.index(name)
+        row[index] = format_datetime(row[index], tz)
+    return row
+
+
+def page_queryset(user, using, last_row):
+    # One keyset page, seeking past the last (created_at, id) on the author index
+    posts = BlogPost.objects.using(using).filter(author=user).order_by('created_at', 'id')
+    if last_row is not None:
+        created_at, pk = last_row[EXPORT_FIELDS.index('created_at')], last_row[EXPORT_FIELDS.index('id')]
+        posts = posts.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+    return posts.values_list(*EXPORT_FIELDS)[:settings.BLOG_EXPORT['CHUNK_SIZE']]
+
+
+def export_pages(user, using):
+    """
+    Yields the user's posts as lists of EXPORT_FIELDS rows, oldest first, with
+    datetimes formatted like the API. Rows are read ``CHUNK_SIZE`` at a time, each
+    page one keyset query, so memory does not grow with the number of posts. Unlike
+    a server-side cursor this also holds behind a transaction pooler, where those
+    are disabled. Every page reads from ``using``, so replicas are not mixed.
+    """
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    last_row = None
+    while True:
+        rows = list(page_queryset(user, using, last_row))
+        if rows:
+            yield [format_row(row, tz) for row in rows]
+        if len(rows) < settings.BLOG_EXPORT['CHUNK_SIZE']:
+            return
+        last_row = rows[-1]
+
+
+async def aexport_pages(user, using):
+    # Async counterpart of export_pages
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    last_row = None
+    while True:
+        rows = [row async for row in page_queryset(user, using, last_row)]
+        if rows:
+            yield [format_row(row, tz) for row in rows]
+        if len(rows) < settings.BLOG_EXPORT['CHUNK_SIZE']:
+            return
+        last_row = rows[-1]
+
+
+class _Line:
+    # File-like object for csv.writer that hands back what it is given
+    def write(self, value):
+        return value
+
+
+class ExportWriter:
+    """
+    Encodes pages of export rows as NDJSON or CSV and returns them as UTF-8 chunks
+    of about ``BUFFER_SIZE`` bytes, so the server writes to the socket per chunk
+    instead of per row. The first line is sent on its own to get the response
+    started. With ``compress`` the chunks are gzipped on the fly, each one flushed
+    so the client sees data as it is produced. Shared by the sync and async streams.
+    """
+
+    def __init__(self, output, compress=False):
+        self.output = output
+        self.size = settings.BLOG_EXPORT['BUFFER_SIZE']
+        self.csv = csv.writer(_Line())
+        self.compressor = None
+        if compress:
+            self.compressor = zlib.compressobj(settings.BLOG_COMPRESSION['GZIP_LEVEL'], zlib.DEFLATED, 31)
+        self.parts = []
+        self.length = 0
+        self.first = True
+
+    def start(self):
+        # The CSV header goes out before the query has returned anything
+        return self.buffer([self.csv.writerow(EXPORT_FIELDS)]) if self.output == 'csv' else []
+
+    def write(self, rows):
+        if self.output == 'csv':
+            return self.buffer([self.csv.writerow(row) for row in rows])
+        return self.buffer([
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, separators=(',', ':')) + '\n'
+            for row in rows
+        ])
+
+    def close(self):
+        chunks = [self.take()] if self.parts else []
+        if self.compressor is not None:
+            chunks.append(self.compressor.flush())
+        return chunks
+
+    def buffer(self, lines):
+        chunks = []
+        for line in lines:
+            self.parts.append(line)
+            self.length += len(line)
+            if self.first or self.length >= self.size:
+                chunks.append(self.take())
+                self.first = False
+        return chunks
+
+    def take(self):
+        chunk = ''.join(self.parts).encode()
+        self.parts = []
+        self.length = 0
+        if self.compressor is not None:
+            chunk = self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return chunk
+
+
+def stream_export(user, output, compress=False):
+    """
+    Returns an iterator over the bytes of the user's export in ``output``
+    (``'ndjson'`` or ``'csv'``), gzip-compressed when ``compress`` is true. The
+    database is picked here, once, so every page comes from the same one.
+    """
+    return _stream(ExportWriter(output, compress), export_pages(user, router.db_for_read(BlogPost)))
+
+
+def astream_export(user, output, compress=False):
+    """
+    Async iterator version of stream_export for ASGI, where Django would otherwise
+    collect a sync iterator into a list before sending the first byte.
+    """
+    return _astream(ExportWriter(output, compress), aexport_pages(user, router.db_for_read(BlogPost)))
+
+
+def _stream(writer, pages):
+    yield from writer.start()
+    for rows in pages:
+        yield from writer.write(rows)
+    yield from writer.close()
+
+
+async def _astream(writer, pages):
+    for chunk in writer.start():
+        yield chunk
+    async for rows in pages:
+        for chunk in writer.write(rows):
+            yield chunk
+    for chunk in writer.close():
+        yield chunk
@@ -0,0 +1,175 @@
+# fastpath.py - Read-only fast path for serializing and rendering blog post lists
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from . import conditional, likebuffer
+from .instrumentation import timed_serialization
+from .pagination import KeysetPagination
+from .serializers import BlogPostSerializer, BlogPostSummarySerializer, get_liked_post_ids
+
+try:
+    import orjson
+except ImportError:  # optional, FastJSONRenderer falls back to the json module
+    orjson = None
+
+# Method fields the fast path knows how to compute, as expressions over the row
+COMPUTED_FIELDS = {
+    'liked_by_me': '{id} in liked_post_ids',
+}
+
+
+def is_enabled():
+    return settings.BLOG_FAST_PATH['ENABLED']
+
+
+def format_datetime(value, tz):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format
+    if value is None:
+        return None
+    if tz is not None:
+        value = value.astimezone(tz)
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+class RowSerializer:
+    """
+    Serializes ``values_list()`` rows into exactly the dicts ``serializer_class``
+    would produce for the same posts, without model instances or field objects.
+
+    The columns and the row-to-dict function are derived once from the serializer's
+    declared fields; a field type it does not know raises ImproperlyConfigured
+    instead of producing different output.
+    """
+
+    def __init__(self, serializer_class=BlogPostSerializer, fields=None):
+        model = serializer_class.Meta.model
+        columns = []
+        items = []
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        for name, field in serializer.fields.items():
+            if name in COMPUTED_FIELDS:
+                items.append((name, COMPUTED_FIELDS[name]))
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                column = model._meta.get_field(field.source).attname
+                template = 'row[{index}]'
+            elif isinstance(field, serializers.DateTimeField) \
+                    and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601:
+                column = field.source
+                template = 'format_datetime(row[{index}], tz)'
+            elif isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.BooleanField)):
+                column = field.source
+                template = 'row[{index}]'
+            else:
+                raise ImproperlyConfigured(f'The fast path cannot serialize {name!r} ({type(field).__name__}).')
+            if column not in columns:
+                columns.append(column)
+            items.append((name, template.format(index=columns.index(column))))
+
+        # Pagination, liked_by_me and the validators need these even when not output
+        columns += [column for column in ('id', 'created_at', 'updated_at') if column not in columns]
+        self.columns = tuple(columns)
+        self.id_index = self.columns.index('id')
+        self.created_at_index = self.columns.index('created_at')
+        self.updated_at_index = self.columns.index('updated_at')
+        id_expression = f'row[{self.id_index}]'
+        body = ', '.join(f'{name!r}: {expression.format(id=id_expression)}' for name, expression in items)
+        namespace = {'format_datetime': format_datetime}
+        exec(f'def row_to_dict(row, liked_post_ids, tz):\n    return {{{body}}}\n', namespace)
+        self.row_to_dict = namespace['row_to_dict']
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def row_ids(self, rows):
+        return [row[self.id_index] for row in rows]
+
+    def validator_key(self, row):
+        # For conditional.get_row_validators
+        return row[self.id_index], row[self.updated_at_index]
+
+    def serialize(self, rows, liked_post_ids):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        row_to_dict = self.row_to_dict
+        with timed_serialization():
+            data = [row_to_dict(row, liked_post_ids, tz) for row in rows]
+        return likebuffer.overlay_like_counts(data, self.row_ids(rows))
+
+
+_row_serializers = {}
+
+
+def get_row_serializer(fields=None):
+    """
+    Returns the RowSerializer for the full representation, or for the summary
+    serializer restricted to ``fields``, compiling each variant once.
+    """
+    # Output order follows the serializer, so the field order asked for does not matter
+    key = None if fields is None else frozenset(fields)
+    row_serializer = _row_serializers.get(key)
+    if row_serializer is None:
+        if fields is None:
+            row_serializer = RowSerializer()
+        else:
+            row_serializer = RowSerializer(BlogPostSummarySerializer, key)
+        _row_serializers[key] = row_serializer
+    return row_serializer
+
+
+class FastKeysetPagination(KeysetPagination):
+    """
+    KeysetPagination over ``RowSerializer`` rows (tuples) instead of model instances.
+    """
+
+    def __init__(self, row_serializer=None):
+        super().__init__()
+        self.row_serializer = row_serializer or get_row_serializer()
+
+    def get_cursor_values(self, row):
+        return row[self.row_serializer.created_at_index], row[self.row_serializer.id_index]
+
+
+def get_list_data(queryset, request, paginate=True, fields=None):
+    """
+    Fast path counterpart of BlogPostListView.get_list_data: the same data, paginated
+    when the request asks for it, built from ``values_list()`` rows. Returns
+    ``(data, (etag, last_modified))``.
+    """
+    row_serializer = get_row_serializer(fields)
+    paginator = FastKeysetPagination(row_serializer)
+    paginated = paginate and paginator.is_requested(request)
+    if paginated:
+        rows = paginator.paginate_queryset(row_serializer.rows(queryset), request)
+        window = paginator.window
+    else:
+        rows = window = list(row_serializer.rows(queryset))
+    liked_post_ids = get_liked_post_ids(request.user, row_serializer.row_ids(rows))
+    data = row_serializer.serialize(rows, liked_post_ids)
+    validators = conditional.get_row_validators(window, request, key=row_serializer.validator_key)
+    return (paginator.get_paginated_data(data) if paginated else data), validators
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. For the plain
+    str/int/bool/list/dict payloads of this API the bytes are identical to
+    JSONRenderer's compact UTF-8 output; anything else goes through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Datetimes and dataclasses would be formatted differently, leave them to JSONRenderer
+            ret = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these two so the output is also valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
@@ -0,0 +1,156 @@
+# feed.py - Precomputed global timeline of the newest blog posts
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import BlogPost
+from .pagination import KeysetPagination
+
+_lock = threading.Lock()
+
+
+class FeedTimeline:
+    """
+    The newest ``BLOG_FEED['SIZE']`` posts as ``(created_at, id)`` pairs, newest
+    first, kept in a Django cache alias.
+
+    The receivers in ``blog.signals`` insert and remove entries as posts are created
+    and deleted, so reading the feed never sorts the posts table. ``complete`` is
+    true when the timeline holds every post, in which case it can answer any page.
+    Updates are read-modify-write on the cache entry: with a shared cache, writers in
+    different processes can race, so the timeline is rebuilt from the database at
+    least every ``TIMEOUT`` seconds to bound any drift.
+    """
+    key = 'blog:feed:timeline'
+
+    def __init__(self):
+        options = settings.BLOG_FEED
+        self.cache = caches[options.get('ALIAS', 'default')]
+        self.size = options.get('SIZE', 500)
+        self.timeout = options.get('TIMEOUT', 300)
+
+    def load(self):
+        state = self.cache.get(self.key)
+        if state is None:
+            state = self.rebuild()
+        return state
+
+    def rebuild(self):
+        # One LIMITed scan of the (created_at, id) index
+        rows = list(BlogPost.objects.order_by('-created_at', '-id').values_list('created_at', 'id')[:self.size + 1])
+        state = {'entries': rows[:self.size], 'complete': len(rows) <= self.size, 'built_at': time.time()}
+        self.cache.set(self.key, state, self.timeout)
+        return state
+
+    def _update(self, change):
+        with _lock:
+            state = self.cache.get(self.key)
+            if state is None:
+                # Nothing cached; the next read rebuilds it from the database
+                return
+            change(state)
+            # Keep the original deadline, so constant writes cannot postpone the rebuild
+            remaining = state['built_at'] + self.timeout - time.time()
+            if remaining > 0:
+                self.cache.set(self.key, state, remaining)
+            else:
+                self.cache.delete(self.key)
+
+    def push(self, posts):
+        def change(state):
+            entries = state['entries']
+            known = {post_id for _, post_id in entries}
+            for post in posts:
+                entry = (post.created_at, post.pk)
+                if post.pk in known:
+                    continue
+                if not state['complete'] and entries and entry < entries[-1]:
+                    # Older than the window, it will be served from the database
+                    continue
+                entries.append(entry)
+            entries.sort(reverse=True)
+            if len(entries) > self.size:
+                del entries[self.size:]
+                state['complete'] = False
+        self._update(change)
+
+    def remove(self, post_ids):
+        post_ids = set(post_ids)
+
+        def change(state):
+            state['entries'] = [entry for entry in state['entries'] if entry[1] not in post_ids]
+        self._update(change)
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Keyset pagination for the global feed, served from ``FeedTimeline``. Pages inside
+    the cached window cost one ``id__in`` query to load the posts; once a reader
+    pages past the window it falls back to a seek on the ``(created_at, id)`` index.
+    """
+    entries = None
+
+    def prepare(self, request):
+        """
+        Reads the page request and, when the timeline can answer it, the timeline
+        entries of the page (``self.entries``, None otherwise).
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.entries = None
+        if settings.BLOG_FEED['ENABLED']:
+            self.entries = self.get_timeline_entries(FeedTimeline().load())
+
+    def get_window_queryset(self, queryset=None):
+        # The posts the page will be built from, look-ahead row included
+        if queryset is None:
+            queryset = BlogPost.objects.all()
+        if self.entries is None:
+            return self.get_page_queryset(queryset, self.request)
+        return queryset.filter(pk__in=[post_id for _, post_id in self.entries])
+
+    def paginate_feed(self, request, queryset=None):
+        """
+        Returns the requested page of ``queryset`` (all posts by default), which may
+        narrow the columns loaded but must not filter out posts.
+        """
+        if queryset is None:
+            queryset = BlogPost.objects.all()
+        if self.request is not request:
+            self.prepare(request)
+        if self.entries is None:
+            return self.paginate_queryset(queryset, request)
+
+        post_ids = [post_id for _, post_id in self.entries]
+        posts = queryset.in_bulk(post_ids)
+        # A post deleted since the timeline was read is simply left out
+        return self.finalize_page([posts[post_id] for post_id in post_ids if post_id in posts])
+
+    def get_timeline_entries(self, state):
+        """
+        Returns the timeline entries for the requested page in the order
+        ``finalize_page`` expects, or None when the timeline cannot answer it.
+        Entries are compared as ``(created_at, id)`` tuples, the feed's sort key.
+        """
+        entries, complete = state['entries'], state['complete']
+        limit = self.page_size + 1
+
+        if self.cursor is None:
+            window = entries[:limit]
+            return window if len(window) == limit or complete else None
+
+        direction, created_at, pk = self.cursor
+        key = (created_at, pk)
+        if direction == 'n':
+            start = next((i for i, entry in enumerate(entries) if entry < key), len(entries))
+            window = entries[start:start + limit]
+            return window if len(window) == limit or complete else None
+
+        if not complete and (not entries or key < entries[-1]):
+            # Posts between the cursor and the window are not in the timeline
+            return None
+        end = next((i for i, entry in enumerate(entries) if entry <= key), len(entries))
+        return entries[max(0, end - limit):end][::-1]
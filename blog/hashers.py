@@ -0,0 +1,62 @@
+# hashers.py - Password hashers whose cost is read from settings.BLOG_PASSWORD_HASHING
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher
+
+# These keep Django's algorithm names, so stored hashes stay valid and Django's
+# rehash-on-login (must_update) moves them to the configured cost transparently.
+
+
+def hashing_option(name):
+    return settings.BLOG_PASSWORD_HASHING[name]
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with a configurable iteration count.
+    """
+
+    @property
+    def iterations(self):
+        return hashing_option('PBKDF2_ITERATIONS')
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with a configurable work factor (N), block size (r) and parallelism (p).
+    """
+
+    @property
+    def work_factor(self):
+        return hashing_option('SCRYPT_WORK_FACTOR')
+
+    @property
+    def block_size(self):
+        return hashing_option('SCRYPT_BLOCK_SIZE')
+
+    @property
+    def parallelism(self):
+        return hashing_option('SCRYPT_PARALLELISM')
+
+    @property
+    def maxmem(self):
+        # scrypt needs about 128 * N * r * p bytes; leave headroom over OpenSSL's 32 MiB default
+        return max(2 * 128 * self.work_factor * self.block_size * self.parallelism, 32 * 1024 * 1024)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with configurable time cost, memory cost (KiB) and parallelism.
+    Requires the argon2-cffi package.
+    """
+
+    @property
+    def time_cost(self):
+        return hashing_option('ARGON2_TIME_COST')
+
+    @property
+    def memory_cost(self):
+        return hashing_option('ARGON2_MEMORY_COST')
+
+    @property
+    def parallelism(self):
+        return hashing_option('ARGON2_PARALLELISM')
@@ -0,0 +1,139 @@
+# hashing.py - Bounded worker pool for password hashing and verification
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import exceptions, status
+
+
+class HashingBusy(exceptions.APIException):
+    """
+    Raised when the hashing pool's queue is full. DRF views answer it with a 503
+    and a Retry-After header.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The server is busy. Try again shortly.'
+    default_code = 'hashing_busy'
+
+    def __init__(self, detail=None, code=None, wait=1):
+        super().__init__(detail, code)
+        # Picked up by DRF's exception handler for the Retry-After header
+        self.wait = wait
+
+
+class HashingPool:
+    """
+    Runs password hashing on at most ``workers`` threads with room for
+    ``max_queue`` more jobs waiting. Further jobs are refused with HashingBusy
+    right away, so an auth storm gets quick 503s instead of ever longer waits, and
+    cheap requests keep their share of the CPU. Django's PBKDF2 and scrypt (hashlib)
+    and argon2-cffi release the GIL while hashing, so the workers run in parallel
+    with each other and with request threads.
+    """
+
+    def __init__(self, workers=4, max_queue=32):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='blog-hashing')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """
+    Returns the process's HashingPool, or None when ``BLOG_HASHING_POOL`` is off
+    and hashing runs on the request thread.
+    """
+    global _pool
+    options = settings.BLOG_HASHING_POOL
+    if not options['ENABLED']:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(workers=options['WORKERS'], max_queue=options['MAX_QUEUE'])
+    return _pool
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting == 'BLOG_HASHING_POOL' and _pool is not None:
+        _pool, pool = None, _pool
+        pool.shutdown()
+
+
+def _verify(password, encoded):
+    # Returns (is_correct, new_encoded), the latter when the hash needs upgrading
+    upgraded = []
+
+    def setter(raw_password):
+        upgraded.append(hashers.make_password(raw_password))
+
+    is_correct = hashers.check_password(password, encoded, setter=setter)
+    return is_correct, upgraded[0] if upgraded else None
+
+
+def make_password(password):
+    pool = get_hashing_pool()
+    return pool.run(hashers.make_password, password) if pool is not None else hashers.make_password(password)
+
+
+async def amake_password(password):
+    pool = get_hashing_pool()
+    if pool is None:
+        # Still off the event loop
+        return await sync_to_async(hashers.make_password, thread_sensitive=False)(password)
+    return await pool.arun(hashers.make_password, password)
+
+
+def check_password(user, password):
+    """
+    ``user.check_password(password)`` with the hashing done in the pool. A hash
+    that needs upgrading is replaced and saved here, on the caller's thread.
+    """
+    pool = get_hashing_pool()
+    if pool is None:
+        return user.check_password(password)
+    is_correct, upgraded = pool.run(_verify, password, user.password)
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+async def acheck_password(user, password):
+    pool = get_hashing_pool()
+    if pool is None:
+        is_correct, upgraded = await sync_to_async(_verify, thread_sensitive=False)(password, user.password)
+    else:
+        is_correct, upgraded = await pool.arun(_verify, password, user.password)
+    if upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+    return is_correct
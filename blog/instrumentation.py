@@ -0,0 +1,159 @@
+# instrumentation.py - Per-request timing, query counting and Prometheus histograms
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_current_metrics = ContextVar('blog_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Timings collected while one sampled request is handled.
+    """
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def db_wrapper(execute, sql, params, many, context):
+    # Unsampled requests pay one context variable lookup per query
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.db_wrapper(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_db_wrapper(sender, connection, **kwargs):
+    """
+    Puts ``db_wrapper`` on every database connection. Async views query through
+    connections of ``sync_to_async`` threads, which a wrapper installed per request
+    on the middleware's thread would miss; the metrics follow the request there in
+    its context.
+    """
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def activate(metrics):
+    return _current_metrics.set(metrics)
+
+
+def deactivate(token):
+    _current_metrics.reset(token)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Adds the time spent in the block to the current request's serializer time.
+    Does nothing when the request is not sampled.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+
+
+class Histogram:
+    """
+    Cumulative Prometheus histogram keyed by a tuple of label values.
+    """
+
+    def __init__(self, name, documentation, buckets, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(self.labelnames, labels))
+            prefix = label_text + ',' if label_text else ''
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    In-process aggregate of all sampled requests, exposed at /api/_metrics. Each
+    worker process keeps its own registry.
+    """
+    labelnames = ('view', 'method', 'status')
+    seconds_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    query_buckets = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.request_duration = Histogram(
+                'blog_request_duration_seconds', 'Wall time of sampled requests.',
+                self.seconds_buckets, self.labelnames)
+            self.db_duration = Histogram(
+                'blog_db_duration_seconds', 'Time spent in database queries per sampled request.',
+                self.seconds_buckets, self.labelnames)
+            self.serialize_duration = Histogram(
+                'blog_serialize_duration_seconds', 'Time spent in serializers per sampled request.',
+                self.seconds_buckets, self.labelnames)
+            self.db_queries = Histogram(
+                'blog_db_queries', 'Database queries per sampled request.',
+                self.query_buckets, self.labelnames)
+
+    def observe(self, labels, total, metrics):
+        with self._lock:
+            self.request_duration.observe(labels, total)
+            self.db_duration.observe(labels, metrics.db_time)
+            self.serialize_duration.observe(labels, metrics.serialize_time)
+            self.db_queries.observe(labels, metrics.db_queries)
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for histogram in (self.request_duration, self.db_duration, self.serialize_duration, self.db_queries):
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
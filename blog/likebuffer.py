@@ -0,0 +1,303 @@
+# likebuffer.py - Optional write-behind buffer for like toggles
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+
+from . import events
+from .cache import bump_list_version
+from .models import AuthorStats, BlogPost, like_count_update
+
+logger = logging.getLogger(__name__)
+
+
+class LikeJournal:
+    """
+    Pending like changes keyed by ``(user_id, post_id)``, each stored as
+    ``(base, liked)``: the state in the database and the state the user asked for.
+    A toggle back to ``base`` removes the entry, so repeated toggles cancel out.
+    Per-post count deltas and per-user states are kept alongside for the read overlay.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.deltas = Counter()
+        self.by_user = defaultdict(dict)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, base, liked):
+        user_id, post_id = key
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.deltas[post_id] -= old[1] - old[0]
+            del self.by_user[user_id][post_id]
+        if liked != base:
+            self.entries[key] = (base, liked)
+            self.deltas[post_id] += liked - base
+            self.by_user[user_id][post_id] = liked
+        if not self.deltas.get(post_id):
+            self.deltas.pop(post_id, None)
+        if not self.by_user.get(user_id):
+            self.by_user.pop(user_id, None)
+
+
+class LikeBuffer:
+    """
+    Records like toggles in an in-process LikeJournal instead of writing them, and
+    flushes the journal every ``interval`` seconds or once it holds ``max_pending``
+    changes: one ``bulk_create``, one DELETE per post and one recount UPDATE per
+    batch, however many toggles it absorbed.
+
+    A toggle still reads the post and, for a pair not already pending, the like row,
+    but no longer takes row locks, so a like storm on one post stops serializing on
+    that row. Reads made through this process overlay the pending changes. Each
+    worker buffers its own toggles and the recount makes flushes from different
+    workers agree; toggles still pending when a process dies are lost. Cached
+    lists and event subscribers hear about the changes once the batch commits.
+    """
+
+    def __init__(self, max_pending=10000, interval=1.0):
+        self.max_pending = max_pending
+        self.interval = interval
+        self.pending = LikeJournal()
+        # The batch being written, still part of the overlay until it commits
+        self.inflight = LikeJournal()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._timer = None
+
+    def start(self):
+        if self.interval and self._timer is None:
+            self._timer = threading.Thread(target=self.run, name='blog-like-buffer', daemon=True)
+            self._timer.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered likes failed')
+            finally:
+                close_old_connections()
+
+    def toggle(self, post_id, user):
+        """
+        Buffered counterpart of ``BlogPost.objects.toggle_like``, with the same
+        return value and errors. Nothing is written yet, so unlike it this sends no
+        ``like_toggled``; ``write`` notifies once the batch commits.
+        """
+        key = (user.pk, post_id)
+        stored = seen = None
+        while True:
+            with self._lock:
+                # Reads from before a flush started or finished may be stale, so read again
+                if seen is self.inflight:
+                    state = self.state(key, stored)
+                    if state is not None:
+                        base, current = state
+                        liked = not current
+                        self.pending.set(key, base, liked)
+                        like_count += self.pending.deltas[post_id] + self.inflight.deltas[post_id]
+                        full = len(self.pending) >= self.max_pending
+                        break
+                seen = self.inflight
+                read_row = self.state(key, None) is None
+            # Read outside the lock, then checked again: a flush may have landed meanwhile
+            like_count = BlogPost.objects.filter(pk=post_id).values_list('like_count', flat=True).get()
+            stored = self.stored(key) if read_row else None
+
+        if full:
+            self.flush()
+        return liked, like_count
+
+    def stored(self, key):
+        # Whether the like row for ``key`` exists
+        user_id, post_id = key
+        return BlogPost.likes.through.objects.filter(blogpost_id=post_id, user_id=user_id).exists()
+
+    def state(self, key, stored):
+        """
+        Returns ``(base, current)`` for ``key`` from the journals, falling back to the
+        like row's state ``stored``; None when that is needed but not read yet.
+        Called with the lock held.
+        """
+        entry = self.pending.get(key)
+        if entry is not None:
+            return entry
+        entry = self.inflight.get(key)
+        if entry is not None:
+            # The database holds the in-flight state once that batch commits
+            return entry[1], entry[1]
+        if stored is None:
+            return None
+        return stored, stored
+
+    def flush(self):
+        """
+        Writes the pending changes to the database. Returns the number written; on
+        failure they are put back in front of any newer toggles and the error raised.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self.pending.entries:
+                    return 0
+                batch, self.pending = self.pending, LikeJournal()
+                self.inflight = batch
+            try:
+                self.write(batch)
+            except Exception:
+                with self._lock:
+                    for key, (base, liked) in batch.entries.items():
+                        newer = self.pending.get(key)
+                        self.pending.set(key, base, newer[1] if newer is not None else liked)
+                raise
+            finally:
+                with self._lock:
+                    self.inflight = LikeJournal()
+            return len(batch)
+
+    def write(self, batch):
+        Like = BlogPost.likes.through
+        removed = defaultdict(list)
+        for (user_id, post_id), (base, liked) in batch.entries.items():
+            if not liked:
+                removed[post_id].append(user_id)
+        post_ids = {post_id for _, post_id in batch.entries}
+        with transaction.atomic():
+            # Likes of posts deleted in the meantime are dropped
+            authors = dict(BlogPost.objects.filter(pk__in=post_ids).values_list('pk', 'author_id'))
+            post_ids = set(authors)
+            Like.objects.bulk_create(
+                [Like(user_id=user_id, blogpost_id=post_id)
+                 for (user_id, post_id), (base, liked) in batch.entries.items() if liked and post_id in post_ids],
+                ignore_conflicts=True, batch_size=1000,
+            )
+            for post_id, user_ids in removed.items():
+                Like.objects.filter(blogpost_id=post_id, user_id__in=user_ids).delete()
+            # Recount rather than add the deltas, so batches from other workers cannot drift the count
+            like_count = Like.objects.filter(blogpost_id=OuterRef('pk')).order_by().values('blogpost_id') \
+                .annotate(count=Count('pk')).values('count')
+            BlogPost.objects.filter(pk__in=post_ids).update(**like_count_update(Coalesce(Subquery(like_count), 0)))
+            # Recounted for the same reason, once per author in the batch
+            AuthorStats.objects.rebuild(set(authors.values()))
+            if authors:
+                bump_list_version(*set(authors.values()))
+            if settings.BLOG_EVENTS['ENABLED']:
+                counts = list(BlogPost.objects.filter(pk__in=post_ids).values_list('pk', 'like_count'))
+                transaction.on_commit(lambda: publish_like_counts(counts))
+
+    def liked_overlay(self, user_id):
+        # {post_id: liked} for the user's pending changes
+        with self._lock:
+            overlay = dict(self.inflight.by_user.get(user_id, ()))
+            overlay.update(self.pending.by_user.get(user_id, ()))
+        return overlay
+
+    def count_overlay(self):
+        with self._lock:
+            if not self.pending.deltas and not self.inflight.deltas:
+                return None
+            # Counter.update, unlike +, keeps negative deltas
+            deltas = Counter(self.pending.deltas)
+            deltas.update(self.inflight.deltas)
+            return deltas
+
+
+def publish_like_counts(counts):
+    for post_id, like_count in counts:
+        events.publish(events.LIKE_COUNT_CHANGED, {'id': post_id, 'like_count': like_count})
+
+
+_like_buffer = None
+
+
+def get_like_buffer():
+    """
+    Returns the process's LikeBuffer, or None when ``BLOG_LIKE_BUFFER`` is off.
+    """
+    global _like_buffer
+    options = settings.BLOG_LIKE_BUFFER
+    if not options['ENABLED']:
+        return None
+    if _like_buffer is None:
+        _like_buffer = LikeBuffer(max_pending=options.get('MAX_PENDING', 10000),
+                                  interval=options.get('INTERVAL', 1.0))
+        _like_buffer.start()
+    return _like_buffer
+
+
+@receiver(setting_changed)
+def reset_like_buffer(setting, **kwargs):
+    global _like_buffer
+    if setting == 'BLOG_LIKE_BUFFER' and _like_buffer is not None:
+        buffer, _like_buffer = _like_buffer, None
+        buffer.stop()
+
+
+def toggle_like(post_id, user):
+    # Entry point for the like views: buffered when enabled, written through otherwise
+    buffer = get_like_buffer()
+    if buffer is None:
+        return BlogPost.objects.toggle_like(post_id, user)
+    return buffer.toggle(post_id, user)
+
+
+async def atoggle_like(post_id, user):
+    if get_like_buffer() is None:
+        return await BlogPost.objects.atoggle_like(post_id, user)
+    return await sync_to_async(get_like_buffer().toggle)(post_id, user)
+
+
+def overlay_liked_post_ids(user, post_ids, liked_post_ids):
+    """
+    Applies the user's pending toggles to ``liked_post_ids`` (a set, changed in
+    place) for the posts in ``post_ids``.
+    """
+    buffer = get_like_buffer()
+    if buffer is None:
+        return liked_post_ids
+    overlay = buffer.liked_overlay(user.pk)
+    if overlay:
+        post_ids = set(post_ids)
+    for post_id, liked in overlay.items():
+        if post_id not in post_ids:
+            continue
+        if liked:
+            liked_post_ids.add(post_id)
+        else:
+            liked_post_ids.discard(post_id)
+    return liked_post_ids
+
+
+def overlay_like_counts(items, post_ids):
+    """
+    Adds pending count deltas to the ``like_count`` of serialized posts, ``items``
+    being the dicts of the posts ``post_ids`` in the same order. Conditional GET
+    validators only move when the batch is flushed.
+    """
+    buffer = get_like_buffer()
+    deltas = buffer.count_overlay() if buffer is not None else None
+    if deltas:
+        for item, post_id in zip(items, post_ids):
+            if post_id in deltas and 'like_count' in item:
+                item['like_count'] += deltas[post_id]
+    return items
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmarks
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds data, drives every blog endpoint with a concurrent in-process client and '
+        'reports latency percentiles, throughput and queries per request as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=100, help='Posts per user.')
+        parser.add_argument('--likes', type=int, default=5, help='Likes per post.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--endpoints', nargs='+', choices=benchmarks.ENDPOINTS, default=benchmarks.ENDPOINTS)
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--check-budgets', action='store_true',
+                            help='Fail if any endpoint exceeds its query budget.')
+        parser.add_argument('--serialization', action='store_true',
+                            help="Also compare the serializer and fast path rows/sec on all seeded posts.")
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the seeded data afterwards.')
+
+    def handle(self, *args, **options):
+        fixtures = benchmarks.seed(
+            users=options['users'], posts_per_user=options['posts'], likes_per_post=options['likes'],
+        )
+        try:
+            results = benchmarks.run_benchmark(
+                fixtures, endpoints=options['endpoints'],
+                requests=options['requests'], concurrency=options['concurrency'],
+            )
+            if options['serialization']:
+                results['serialization'] = benchmarks.benchmark_serialization(
+                    BlogPost.objects.filter(author__in=fixtures.users).order_by('-created_at', '-id'),
+                    fixtures.users[0],
+                )
+        finally:
+            if not options['keep_data']:
+                benchmarks.cleanup(fixtures)
+
+        meta = {key: options[key] for key in ('users', 'posts', 'likes', 'requests', 'concurrency')}
+        if options['output']:
+            benchmarks.write_report(options['output'], results, **meta)
+        self.stdout.write(json.dumps(results, indent=2))
+
+        if options['check_budgets']:
+            exceeded = benchmarks.check_budgets(results)
+            if exceeded:
+                raise CommandError('Query budget exceeded: ' + ', '.join(
+                    f'{endpoint} ran {queries} queries (budget {budget})' for endpoint, queries, budget in exceeded
+                ))
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmarks
+
+LEAN_SETTINGS = 'Assignment2_backend.settings_api'
+FULL_SETTINGS = 'Assignment2_backend.settings'
+LEAN_FORBIDDEN_MODULES = (
+    'blog.admin', 'django.contrib.sessions', 'django.contrib.staticfiles', 'django_filters',
+    # Optional features, imported by the views that use them
+    'orjson', 'blog.fastpath', 'blog.search', 'blog.feed', 'blog.async_views',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Cold-starts the WSGI application in fresh interpreters and reports time to the '
+        'first response and an import-time breakdown (python -X importtime) as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-module', action='append', dest='settings_modules',
+                            help=f'Settings to measure; repeatable. Default: {FULL_SETTINGS} and {LEAN_SETTINGS}.')
+        parser.add_argument('--path', default='/api/blogs/', help='Path of the first request.')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list.')
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+        parser.add_argument('--max-ms', type=float,
+                            help='Fail if the median time to first response of any settings exceeds this.')
+
+    def handle(self, *args, **options):
+        results = [
+            benchmarks.measure_startup(settings_module, path=options['path'], runs=options['runs'], top=options['top'])
+            for settings_module in options['settings_modules'] or [FULL_SETTINGS, LEAN_SETTINGS]
+        ]
+        report = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(report)
+        self.stdout.write(report)
+
+        problems = []
+        for result in results:
+            if options['max_ms'] is not None and result['first_response_ms'] > options['max_ms']:
+                problems.append(f"{result['settings']} took {result['first_response_ms']} ms to first response")
+            if result['settings'] == LEAN_SETTINGS:
+                loaded = [name for name in result['watched_modules'] if name in LEAN_FORBIDDEN_MODULES]
+                if loaded:
+                    problems.append(f"{LEAN_SETTINGS} imported {', '.join(loaded)}")
+        if problems:
+            raise CommandError('Startup regression: ' + '; '.join(problems))
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes auth tokens unused for longer than BLOG_TOKEN_EXPIRY["TTL"], in small '
+        'chunks so no long lock is held on the token table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between chunks.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count expired tokens.')
+
+    def handle(self, *args, **options):
+        ttl = settings.BLOG_TOKEN_EXPIRY['TTL']
+        if not ttl:
+            raise CommandError('Token expiry is disabled (BLOG_TOKEN_EXPIRY["TTL"] is 0).')
+        cutoff = timezone.now() - timedelta(seconds=ttl)
+        expired = Token.objects.filter(created__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} expired tokens.')
+            return
+
+        total = 0
+        while True:
+            # Each chunk is its own short statement on the created index
+            keys = list(expired.order_by('created').values_list('key', flat=True)[:options['chunk_size']])
+            if not keys:
+                break
+            deleted, _ = Token.objects.filter(key__in=keys, created__lt=cutoff).delete()
+            total += deleted
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired tokens.'))
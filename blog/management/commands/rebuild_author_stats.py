@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import AuthorStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes every author\'s AuthorStats row from the posts table in batches, '
+        'or with --verify only reports the rows that differ from it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--verify', action='store_true',
+                            help='Compare instead of rebuilding; fails if any row is wrong.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        checked = 0
+        mismatches = []
+        last_id = 0
+        while True:
+            # Each batch seeks past the previous one, so no long transaction or offset scan
+            batch = list(user_ids.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            checked += len(batch)
+            if options['verify']:
+                mismatches += AuthorStats.objects.verify(batch)
+            else:
+                AuthorStats.objects.rebuild(batch)
+
+        if not options['verify']:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the stats of {checked} users.'))
+            return
+        fields = ', '.join(AuthorStats.STATS_FIELDS)
+        for author_id, stored, expected in mismatches[:20]:
+            self.stdout.write(f'User {author_id} ({fields}): stored {stored}, expected {expected}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} of {checked} users have wrong stats; '
+                               'run rebuild_author_stats without --verify.')
+        self.stdout.write(self.style.SUCCESS(f'Verified the stats of {checked} users.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes every trending score from the stored like counts, e.g. after '
+        'changing the formula or to clear floating point drift from incremental updates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = BlogPost.objects.recompute_trending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed trending scores of {total} posts.'))
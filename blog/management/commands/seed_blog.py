@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Seeds users, tokens, posts and likes for benchmarking the blog API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=100, help='Posts per user.')
+        parser.add_argument('--likes', type=int, default=5, help='Likes per post.')
+        parser.add_argument('--prefix', default='bench', help='Username prefix of the seeded users.')
+
+    def handle(self, *args, **options):
+        fixtures = benchmarks.seed(
+            users=options['users'], posts_per_user=options['posts'],
+            likes_per_post=options['likes'], prefix=options['prefix'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(fixtures.users)} users and {len(fixtures.post_ids)} posts '
+            f'(usernames start with {fixtures.prefix}_, password {benchmarks.BENCH_PASSWORD!r}).'
+        ))
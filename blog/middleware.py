@@ -0,0 +1,228 @@
+# middleware.py - Request middleware for the blog API
+import gzip
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from . import instrumentation, routers
+
+try:
+    import brotli
+except ImportError:  # optional, enables Content-Encoding: br
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, enables Content-Encoding: zstd
+    zstandard = None
+
+
+class BlogMiddleware:
+    """
+    Base for the middleware below, which runs sync or async to match the rest of
+    the chain, so under ASGI the async views are awaited on the event loop instead
+    of being run through ``async_to_sync`` in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def __acall__(self, request):
+        raise NotImplementedError
+
+
+class InstrumentationMiddleware(BlogMiddleware):
+    """
+    Measures sampled requests: number of queries and time spent in the database
+    (through ``instrumentation.db_wrapper``), serializer time and total wall time.
+    The numbers go out in a ``Server-Timing`` header and into the in-process
+    histograms served by ``/api/_metrics``.
+
+    ``BLOG_METRICS['SAMPLE_RATE']`` (0.0-1.0) controls the share of requests that
+    are measured; unsampled requests only pay for one ``random()`` call.
+    """
+
+    def sampled(self):
+        options = settings.BLOG_METRICS
+        return options['ENABLED'] and random.random() < options['SAMPLE_RATE']
+
+    def handle(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation.activate(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        metrics = instrumentation.RequestMetrics()
+        # Context variables follow the request into sync_to_async threads
+        token = instrumentation.activate(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+        return self.record(request, response, metrics, time.perf_counter() - started)
+
+    def record(self, request, response, metrics, total):
+        if settings.BLOG_METRICS['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.db_queries} queries", '
+                f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}'
+            )
+        # Label by URL name rather than path to keep the number of series bounded
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unmatched'
+        instrumentation.registry.observe((view, request.method, response.status_code), total, metrics)
+        return response
+
+
+class ReadYourWritesMiddleware(BlogMiddleware):
+    """
+    Pins a client to the primary database for ``BLOG_DB_ROUTING['PIN_SECONDS']``
+    after a request of theirs wrote, so PrimaryReplicaRouter does not serve them a
+    replica that has not caught up yet. Clients are keyed on a hash of their
+    Authorization header in a cache shared by all workers; anonymous requests are
+    never pinned. Does nothing without replicas.
+    """
+
+    def handle(self, request):
+        options = settings.BLOG_DB_ROUTING
+        if not options.get('REPLICAS'):
+            return self.get_response(request)
+
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        key = routers.pin_key(authorization) if authorization else None
+        pinned = key is not None and routers.get_pin_cache().get(key) is not None
+        state, token = routers.begin_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        if state.written and key is not None:
+            routers.get_pin_cache().set(key, True, options['PIN_SECONDS'])
+        return response
+
+    async def __acall__(self, request):
+        options = settings.BLOG_DB_ROUTING
+        if not options.get('REPLICAS'):
+            return await self.get_response(request)
+
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        key = routers.pin_key(authorization) if authorization else None
+        pinned = key is not None and await routers.get_pin_cache().aget(key) is not None
+        # The state object is shared with the sync_to_async threads the ORM runs in
+        state, token = routers.begin_request(pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        if state.written and key is not None:
+            await routers.get_pin_cache().aset(key, True, options['PIN_SECONDS'])
+        return response
+
+
+def available_encodings():
+    """
+    Returns the content codings this process can produce, best first, each with a
+    function compressing bytes at the levels from ``BLOG_COMPRESSION``.
+    """
+    options = settings.BLOG_COMPRESSION
+    encodings = {}
+    if zstandard is not None:
+        encodings['zstd'] = lambda data: zstandard.ZstdCompressor(level=options['ZSTD_LEVEL']).compress(data)
+    if brotli is not None:
+        encodings['br'] = lambda data: brotli.compress(data, quality=options['BROTLI_QUALITY'])
+    encodings['gzip'] = lambda data: gzip.compress(data, compresslevel=options['GZIP_LEVEL'], mtime=0)
+    return encodings
+
+
+def select_encoding(accept_encoding, available):
+    """
+    Picks the coding from ``available`` (ordered best first) with the highest
+    q-value in the Accept-Encoding header, or None.
+    """
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware(BlogMiddleware):
+    """
+    Compresses response bodies of at least ``BLOG_COMPRESSION['MIN_SIZE']`` bytes with
+    the best coding the client accepts: zstd or brotli when those packages are
+    installed, gzip otherwise. Streaming responses and responses that are already
+    encoded pass through untouched. Like Django's GZipMiddleware, strong ETags are
+    weakened, since the compressed bytes differ from the identity representation.
+    """
+
+    def handle(self, request):
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        options = settings.BLOG_COMPRESSION
+        if not options['ENABLED'] or response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < options['MIN_SIZE']:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodings = available_encodings()
+        encoding = select_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), encodings)
+        if encoding is None:
+            return response
+
+        compressed = encodings[encoding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blogpost_likes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='blog_post_author_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-17 12:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counts(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Like = BlogPost.likes.through
+    counts = (
+        Like.objects.filter(blogpost_id=OuterRef('pk'))
+        .order_by()
+        .values('blogpost_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    BlogPost.objects.update(like_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_author_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Postgres keeps a weighted tsvector of title and content in a generated column, so it
+# can never go stale, with a GIN index for @@ lookups. On SQLite the FTS5 table is
+# installed by blog.search.install_sqlite_fts after every migrate instead.
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE blog_blogpost ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX blog_post_search_idx ON blog_blogpost USING GIN (search_vector)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS blog_post_search_idx',
+    'ALTER TABLE blog_blogpost DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_on_postgres(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogpost_like_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgres(POSTGRES_FORWARD), run_on_postgres(POSTGRES_BACKWARD)),
+    ]
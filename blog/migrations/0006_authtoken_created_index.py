@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Indexes authtoken_token.created so purge_expired_tokens can find expired tokens
+    chunk by chunk without scanning the table.
+    """
+
+    dependencies = [
+        ('blog', '0005_blogpost_search_vector'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS blog_authtoken_created_idx ON authtoken_token (created)',
+            'DROP INDEX IF EXISTS blog_authtoken_created_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_authtoken_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['created_at', 'id'], name='blog_post_created_idx'),
+        ),
+    ]
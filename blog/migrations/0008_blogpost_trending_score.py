@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-17 13:14
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copy of blog.models.trending_score
+TRENDING_EPOCH = 1704067200
+TRENDING_DECAY = 45000
+
+
+def backfill_trending_scores(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('id', 'like_count', 'created_at').iterator(chunk_size=1000):
+        post.trending_score = (
+            math.log10(max(post.like_count, 1)) + (post.created_at.timestamp() - TRENDING_EPOCH) / TRENDING_DECAY
+        )
+        batch.append(post)
+        if len(batch) >= 1000:
+            BlogPost.objects.bulk_update(batch, ['trending_score'])
+            batch = []
+    if batch:
+        BlogPost.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blogpost_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='trending_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_trending_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-trending_score', '-id'], name='blog_post_trending_idx'),
+        ),
+    ]
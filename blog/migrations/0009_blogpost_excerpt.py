@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-17 13:19
+
+from django.db import migrations, models
+
+
+def make_excerpt(content, length=200):
+    # Frozen copy of blog.models.make_excerpt
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '\u2026'
+
+
+def backfill_summaries(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('id', 'content').iterator(chunk_size=1000):
+        post.excerpt = make_excerpt(post.content)
+        post.content_length = len(post.content)
+        batch.append(post)
+        if len(batch) >= 1000:
+            BlogPost.objects.bulk_update(batch, ['excerpt', 'content_length'])
+            batch = []
+    if batch:
+        BlogPost.objects.bulk_update(batch, ['excerpt', 'content_length'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_blogpost_trending_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-17 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+
+
+def backfill_author_stats(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    AuthorStats = apps.get_model('blog', 'AuthorStats')
+    # One pass over liked posts for the top posts, one grouped pass for the totals
+    top_posts = {}
+    liked = BlogPost.objects.filter(like_count__gt=0).order_by('author_id', '-like_count', 'id')
+    for author_id, post_id, like_count in liked.values_list('author_id', 'id', 'like_count').iterator(chunk_size=2000):
+        top_posts.setdefault(author_id, (post_id, like_count))
+    totals = BlogPost.objects.order_by('author_id').values('author_id').annotate(
+        post_count=Count('id'), likes_received=Sum('like_count'),
+    )
+    batch = []
+    for row in totals.iterator(chunk_size=2000):
+        top_post_id, top_post_like_count = top_posts.get(row['author_id'], (None, 0))
+        batch.append(AuthorStats(
+            user_id=row['author_id'], post_count=row['post_count'], likes_received=row['likes_received'] or 0,
+            top_post_id=top_post_id, top_post_like_count=top_post_like_count,
+        ))
+        if len(batch) >= 1000:
+            AuthorStats.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        AuthorStats.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0010_blogpost_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blog_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('likes_received', models.PositiveIntegerField(default=0)),
+                ('top_post_like_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('top_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.blogpost')),
+            ],
+            options={
+                'verbose_name_plural': 'author stats',
+            },
+        ),
+        migrations.RunPython(backfill_author_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,145 @@
 # models.py - Defines the database models for the blog app
-from django.db import models
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Log
 from django.contrib.auth.models import User
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent by BlogPost.objects.toggle_like with post_id, author_id, user, liked and
+# like_count, since the toggle bypasses m2m_changed.
+like_toggled = Signal()
+
+# Sent by BlogPost.objects.create_batch with author_id and posts, since bulk_create
+# does not send post_save.
+posts_bulk_created = Signal()
+
+
+# Trending score: log10(likes) plus creation time in units of TRENDING_DECAY seconds,
+# so a post needs ten times the likes to rank level with one posted 12.5 hours later.
+# Only like changes move a score; time decay comes from newer posts scoring higher.
+TRENDING_EPOCH = 1704067200  # 2024-01-01T00:00:00Z, keeps scores small
+TRENDING_DECAY = 45000
+
+
+def trending_score(like_count, created_at):
+    return math.log10(max(like_count, 1)) + (created_at.timestamp() - TRENDING_EPOCH) / TRENDING_DECAY
+
+
+def like_count_update(new_like_count):
+    """
+    Returns ``update()`` kwargs that set ``like_count`` to ``new_like_count`` (an
+    expression over the old value) and move ``trending_score`` by the same change in
+    log10(likes), in one UPDATE and without reading the row first. ``updated_at``
+    moves too, since the like count is part of every representation of the post.
+    """
+    return {
+        'like_count': new_like_count,
+        'updated_at': timezone.now(),
+        'trending_score': (
+            F('trending_score') + Log(10, Greatest(new_like_count, 1)) - Log(10, Greatest(F('like_count'), 1))
+        ),
+    }
+
+
+# Length of the stored plain-text preview served by summary lists
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(content, length=EXCERPT_LENGTH):
+    """
+    Returns ``content`` with whitespace collapsed, cut to at most ``length``
+    characters at a word boundary and ending in an ellipsis when shortened.
+    """
+    text = ' '.join(content.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '\u2026'
+
+
+class BlogPostQuerySet(models.QuerySet):
+
+    def create_batch(self, author, rows, batch_size=None):
+        """
+        Inserts one post per dict in ``rows`` for ``author`` using bulk_create in
+        chunks of ``batch_size``, all inside one transaction. Returns the new posts.
+        """
+        now = timezone.now()
+        # bulk_create skips save(), so the initial score is set here
+        posts = [self.model(author=author, trending_score=trending_score(0, now), **row) for row in rows]
+        for post in posts:
+            post.update_summary()
+        with transaction.atomic():
+            self.bulk_create(posts, batch_size=batch_size)
+            AuthorStats.objects.record_posts(author.pk, len(posts))
+        posts_bulk_created.send(sender=self.model, author_id=author.pk, posts=posts)
+        return posts
+
+    def toggle_like(self, post_id, user):
+        """
+        Likes the post for ``user`` if they have not liked it yet, otherwise unlikes it.
+        Returns ``(liked, like_count)`` and raises ``BlogPost.DoesNotExist`` for an
+        unknown post.
+
+        The through table is touched with a single DELETE, falling back to a single
+        INSERT when nothing was deleted, and ``like_count`` moves with an atomic F()
+        update in the same transaction, so concurrent toggles never lose a count.
+        """
+        Like = self.model.likes.through
+        for attempt in range(2):
+            try:
+                with transaction.atomic():
+                    unliked, _ = Like.objects.filter(blogpost_id=post_id, user_id=user.pk).delete()
+                    if unliked:
+                        self.filter(pk=post_id).update(**like_count_update(F('like_count') - unliked))
+                    else:
+                        if not self.filter(pk=post_id).update(**like_count_update(F('like_count') + 1)):
+                            raise self.model.DoesNotExist('Post not found.')
+                        Like.objects.create(blogpost_id=post_id, user_id=user.pk)
+                    like_count, author_id = self.filter(pk=post_id).values_list('like_count', 'author_id').get()
+                    AuthorStats.objects.record_like(author_id, post_id, like_count, -unliked if unliked else 1)
+                liked = not unliked
+                like_toggled.send(
+                    sender=self.model, post_id=post_id, author_id=author_id, user=user,
+                    liked=liked, like_count=like_count,
+                )
+                return liked, like_count
+            except IntegrityError:
+                # A concurrent request liked it first; toggle again against the new state
+                if attempt:
+                    raise
+
+    async def atoggle_like(self, post_id, user):
+        # The toggle must run in one transaction, which the async ORM cannot span yet
+        return await sync_to_async(self.toggle_like)(post_id, user)
+
+    def trending(self, limit):
+        # Reads the first ``limit`` entries of the trending index, whatever the table size
+        return self.order_by('-trending_score', '-id')[:limit]
+
+    def recompute_trending(self, batch_size=1000):
+        """
+        Recomputes ``trending_score`` for every post in the queryset from its stored
+        ``like_count`` and ``created_at``, in batches. Returns the number of posts.
+        """
+        total = 0
+        batch = []
+        for post in self.only('id', 'like_count', 'created_at').iterator(chunk_size=batch_size):
+            post.trending_score = trending_score(post.like_count, post.created_at)
+            batch.append(post)
+            if len(batch) >= batch_size:
+                total += self.model.objects.bulk_update(batch, ['trending_score'])
+                batch = []
+        if batch:
+            total += self.model.objects.bulk_update(batch, ['trending_score'])
+        return total
+
 
 class BlogPost(models.Model):
     # Represents a blog post created by a user
@@ -8,4 +147,166 @@ class BlogPost(models.Model):
     content = models.TextField()              # Content/body of the blog post
     author = models.ForeignKey(User, on_delete=models.CASCADE)  # Reference to the post's author
     created_at = models.DateTimeField(auto_now_add=True)        # Timestamp of creation
+    updated_at = models.DateTimeField(auto_now=True)            # Last change, likes included
     likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
+    like_count = models.PositiveIntegerField(default=0)         # Denormalized count of likes
+    trending_score = models.FloatField(default=0.0)             # See trending_score()
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='')  # Derived from content
+    content_length = models.PositiveIntegerField(default=0)     # Characters in content
+
+    objects = BlogPostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks on (created_at, id) within one author's posts
+            models.Index(fields=['author', 'created_at', 'id'], name='blog_post_author_created_idx'),
+            # The global feed seeks on (created_at, id) across all authors
+            models.Index(fields=['created_at', 'id'], name='blog_post_created_idx'),
+            # Top-N trending reads walk this index
+            models.Index(fields=['-trending_score', '-id'], name='blog_post_trending_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.trending_score:
+            # auto_now_add fills created_at during the insert, moments after now
+            self.trending_score = trending_score(self.like_count, timezone.now())
+        if 'content' not in self.get_deferred_fields():
+            self.update_summary()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'excerpt', 'content_length'}
+        if self._state.adding:
+            # The post_save receiver counts the post in the same transaction as the insert
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+
+    def update_summary(self):
+        # Keeps the stored excerpt and length in step with content
+        self.excerpt = make_excerpt(self.content)
+        self.content_length = len(self.content)
+
+
+def author_stats_values(author_id):
+    """
+    Returns expressions computing an author's stats from the posts table, with
+    ``author_id`` an ``OuterRef`` to the author's id. A post with no likes is never
+    the top post; ties go to the oldest post.
+    """
+    posts = BlogPost.objects.filter(author_id=author_id).order_by().values('author_id')
+    top = BlogPost.objects.filter(author_id=author_id, like_count__gt=0).order_by('-like_count', 'id')
+    return {
+        'post_count': Coalesce(Subquery(posts.annotate(total=Count('pk')).values('total')), 0),
+        'likes_received': Coalesce(Subquery(posts.annotate(total=Sum('like_count')).values('total')), 0),
+        'top_post_id': Subquery(top.values('pk')[:1]),
+        'top_post_like_count': Coalesce(Subquery(top.values('like_count')[:1]), 0),
+    }
+
+
+class AuthorStatsQuerySet(models.QuerySet):
+
+    def apply(self, author_id, **changes):
+        """
+        Updates the author's row with ``changes``, or builds it from the posts table
+        when it does not exist yet, in which case the change being recorded is
+        already there to count.
+        """
+        if not self.filter(pk=author_id).update(updated_at=timezone.now(), **changes):
+            self.rebuild([author_id])
+
+    def record_posts(self, author_id, count):
+        # New posts have no likes, so the top post stays as it is
+        self.apply(author_id, post_count=F('post_count') + count)
+
+    def record_like(self, author_id, post_id, like_count, delta):
+        """
+        Records ``delta`` likes on ``post_id``, which now has ``like_count``. A post
+        gaining likes takes over as top post when it passes the current one; only
+        when the top post itself loses likes is the top post looked up again.
+        """
+        if delta > 0:
+            takes_over = (Q(top_post__isnull=True) | Q(top_post=post_id) | Q(top_post_like_count__lt=like_count)
+                          | Q(top_post_like_count=like_count, top_post__gt=post_id))
+            top_post = Value(post_id)
+            top_post_like_count = Value(like_count)
+        else:
+            takes_over = Q(top_post=post_id)
+            top = author_stats_values(OuterRef('pk'))
+            top_post, top_post_like_count = top['top_post_id'], top['top_post_like_count']
+        self.apply(
+            author_id,
+            likes_received=Greatest(F('likes_received') + delta, 0),
+            top_post=Case(When(takes_over, then=top_post), default=F('top_post'), output_field=models.IntegerField()),
+            top_post_like_count=Case(When(takes_over, then=top_post_like_count), default=F('top_post_like_count'),
+                                     output_field=models.IntegerField()),
+        )
+
+    def record_delete(self, author_id, like_count):
+        # Deleting the top post has already set top_post to NULL, see AuthorStats.top_post
+        top = author_stats_values(OuterRef('pk'))
+        self.apply(
+            author_id,
+            post_count=Greatest(F('post_count') - 1, 0),
+            likes_received=Greatest(F('likes_received') - like_count, 0),
+            top_post=Coalesce(F('top_post'), top['top_post_id']),
+            top_post_like_count=Case(When(top_post__isnull=True, then=top['top_post_like_count']),
+                                     default=F('top_post_like_count')),
+        )
+
+    def compute(self, author_ids):
+        """
+        Returns ``{author_id: (post_count, likes_received, top_post_id,
+        top_post_like_count)}`` computed from the posts table, in one query.
+        """
+        rows = User.objects.filter(pk__in=author_ids).order_by().annotate(**{
+            f'stats_{name}': value for name, value in author_stats_values(OuterRef('pk')).items()
+        }).values_list('pk', *(f'stats_{name}' for name in AuthorStats.STATS_FIELDS))
+        return {pk: tuple(values) for pk, *values in rows}
+
+    def rebuild(self, author_ids):
+        """
+        Recomputes the rows of ``author_ids`` from the posts table in two queries.
+        Authors without posts get no row, which reads as all zeros.
+        """
+        computed = self.compute(author_ids)
+        rows = [self.model(user_id=pk, **dict(zip(AuthorStats.STATS_FIELDS, values)))
+                for pk, values in computed.items() if values[0]]
+        self.bulk_create(rows, update_conflicts=True, unique_fields=['user'],
+                         update_fields=[*AuthorStats.STATS_FIELDS, 'updated_at'])
+        self.filter(pk__in=[pk for pk, values in computed.items() if not values[0]]).delete()
+        return len(rows)
+
+    def verify(self, author_ids):
+        """
+        Returns ``[(author_id, stored, expected)]`` for the authors among
+        ``author_ids`` whose row differs from the posts table.
+        """
+        computed = self.compute(author_ids)
+        stored = {pk: tuple(values) for pk, *values in
+                  self.filter(pk__in=author_ids).values_list('pk', *AuthorStats.STATS_FIELDS)}
+        zeros = (0, 0, None, 0)
+        return [(pk, stored.get(pk, zeros), computed.get(pk, zeros)) for pk in author_ids
+                if stored.get(pk, zeros) != computed.get(pk, zeros)]
+
+
+class AuthorStats(models.Model):
+    """
+    Per-author aggregates, kept up to date in the transaction of every post create,
+    delete and like change so reading them is one primary key lookup.
+    ``rebuild_author_stats`` recomputes and verifies them.
+    """
+    STATS_FIELDS = ('post_count', 'likes_received', 'top_post_id', 'top_post_like_count')
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='blog_stats')
+    post_count = models.PositiveIntegerField(default=0)
+    likes_received = models.PositiveIntegerField(default=0)     # Sum of like_count over the author's posts
+    # Most liked post; deleting it sets NULL, which record_delete() fills in again
+    top_post = models.ForeignKey(BlogPost, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    top_post_like_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AuthorStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'author stats'
@@ -0,0 +1,135 @@
+# pagination.py - Keyset (cursor) pagination for blog post lists
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination:
+    """
+    Seek-based pagination over ``(created_at, id)``, newest first.
+
+    Each page is fetched with a ``WHERE (created_at, id) < (...)`` predicate and a
+    ``LIMIT``, never an ``OFFSET``, so with the ``(author, created_at, id)`` index the
+    cost of a page does not depend on how deep into the list the client is.
+    Cursors are opaque base64 tokens carrying the direction and the boundary row.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = settings.BLOG_PAGE_SIZE
+        self.cursor = None
+        self.has_next = False
+        self.has_previous = False
+        self.rows = []
+        self.window = []
+        self.request = None
+
+    def is_requested(self, request):
+        # Plain GETs keep returning the full list so existing clients are unaffected
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.BLOG_PAGE_SIZE
+        if page_size <= 0:
+            return settings.BLOG_PAGE_SIZE
+        return min(page_size, settings.BLOG_MAX_PAGE_SIZE)
+
+    def get_cursor_values(self, row):
+        return row.created_at, row.pk
+
+    def encode_cursor(self, direction, row):
+        created_at, pk = self.get_cursor_values(row)
+        payload = json.dumps([direction, created_at.isoformat(), pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Returns the lazy queryset for the requested page (one row more than the page
+        size, to detect whether a further page exists). Evaluate it with
+        ``finalize_page`` so the async views can iterate it with ``async for``.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            return queryset.order_by('-created_at', '-id')[:self.page_size + 1]
+
+        direction, created_at, pk = self.cursor
+        if direction == 'n':
+            seek = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ordering = ('-created_at', '-id')
+        else:
+            seek = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ordering = ('created_at', 'id')
+        return queryset.filter(seek).order_by(*ordering)[:self.page_size + 1]
+
+    def finalize_page(self, rows):
+        rows = list(rows)
+        # Everything fetched, look-ahead row included; conditional validators cover it
+        self.window = rows
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if self.cursor is not None and self.cursor[0] == 'p':
+            # Backward pages are fetched in ascending order, flip them back
+            rows.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        self.rows = rows
+        return rows
+
+    def paginate_queryset(self, queryset, request):
+        return self.finalize_page(self.get_page_queryset(queryset, request))
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor('n', self.rows[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if not self.rows:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor('p', self.rows[0]))
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
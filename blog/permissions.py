@@ -0,0 +1,19 @@
+# permissions.py - Permissions for the blog API
+import hmac
+
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class CanReadMetrics(BasePermission):
+    """
+    Lets staff users read the metrics, and scrapers that send
+    ``Authorization: Bearer <TOKEN>`` when ``BLOG_METRICS['TOKEN']`` is set.
+    """
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        secret = settings.BLOG_METRICS.get('TOKEN')
+        scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return bool(secret) and scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), secret.encode())
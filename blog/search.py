@@ -0,0 +1,153 @@
+# search.py - Full-text search over blog post titles and content
+import base64
+import json
+import re
+
+from django.db import connections, router
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from .models import BlogPost
+from .pagination import KeysetPagination
+
+# SQLite keeps an external-content FTS5 table in sync with blog_blogpost through
+# triggers. Postgres uses the generated search_vector column from migration 0005.
+SQLITE_FTS_TABLE = 'blog_blogpost_fts'
+
+SQLITE_FTS_SETUP = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        title, content, content='blog_blogpost', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON blog_blogpost BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON blog_blogpost BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF title, content ON blog_blogpost BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+# Title matches weigh more than content matches
+SQLITE_SEARCH_SQL = f"""
+    SELECT id, rank FROM (
+        SELECT f.rowid AS id, -bm25({SQLITE_FTS_TABLE}, 10.0, 1.0) AS rank
+        FROM {SQLITE_FTS_TABLE} f JOIN blog_blogpost p ON p.id = f.rowid
+        WHERE {SQLITE_FTS_TABLE} MATCH %s AND p.author_id = %s
+    )
+"""
+
+POSTGRES_SEARCH_SQL = """
+    SELECT id, rank FROM (
+        SELECT p.id, ts_rank_cd(p.search_vector, q) AS rank
+        FROM blog_blogpost p, websearch_to_tsquery('english', %s) q
+        WHERE p.search_vector @@ q AND p.author_id = %s
+    ) s
+"""
+
+
+def install_sqlite_fts(sender, using, **kwargs):
+    """
+    Creates the FTS5 table and its triggers on SQLite. This runs after every migrate
+    rather than once in a migration, because SQLite rebuilds blog_blogpost for many
+    schema changes and dropping the old table drops its triggers with it.
+    Connected to post_migrate in BlogConfig.ready().
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or not router.allow_migrate(using, 'blog'):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [SQLITE_FTS_TABLE + '_a_'],
+        )
+        triggers_missing = cursor.fetchone()[0] < 3
+        for statement in SQLITE_FTS_SETUP:
+            cursor.execute(statement)
+        if triggers_missing:
+            # Writes made while the triggers were gone never reached the index
+            cursor.execute(f"INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def to_fts5_query(query):
+    # Quote every word so user input can never be parsed as FTS5 syntax
+    return ' '.join(f'"{term}"' for term in re.findall(r'\w+', query))
+
+
+class SearchUnavailable(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = 'Full-text search is not available on this database.'
+    default_code = 'search_unavailable'
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Keyset pagination over ``(rank, id)`` for full-text search results, best match
+    first. Ranks come from ts_rank_cd on Postgres and bm25 on SQLite; other
+    databases have no index to search and get SearchUnavailable (501) rather than
+    a scan of the whole table.
+    """
+
+    def encode_cursor(self, direction, row):
+        payload = json.dumps([direction, row.search_rank, row.pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, rank, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, float(rank), int(pk)
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def search(self, query, author, request):
+        """
+        Returns the requested page of ``author``'s posts matching ``query``, each with
+        a ``search_rank`` attribute. Costs one index-backed search query plus one
+        ``id__in`` query to load the matching posts.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        using = router.db_for_read(BlogPost)
+        vendor = connections[using].vendor
+        if vendor == 'postgresql':
+            sql, params = POSTGRES_SEARCH_SQL, [query, author.pk]
+        elif vendor == 'sqlite':
+            sql, params = SQLITE_SEARCH_SQL, [to_fts5_query(query), author.pk]
+            if not params[0]:
+                return self.finalize_page([])
+        else:
+            raise SearchUnavailable()
+
+        if self.cursor is None:
+            sql += ' ORDER BY rank DESC, id DESC'
+        else:
+            direction, rank, pk = self.cursor
+            op, order = ('<', 'DESC') if direction == 'n' else ('>', 'ASC')
+            sql += f' WHERE rank {op} %s OR (rank = %s AND id {op} %s) ORDER BY rank {order}, id {order}'
+            params += [rank, rank, pk]
+        sql += ' LIMIT %s'
+        params.append(self.page_size + 1)
+
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, params)
+            hits = cursor.fetchall()
+
+        posts = BlogPost.objects.using(using).in_bulk([post_id for post_id, _ in hits])
+        rows = []
+        for post_id, rank in hits:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = rank
+                rows.append(post)
+        return self.finalize_page(rows)
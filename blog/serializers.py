@@ -1,8 +1,12 @@
 # serializers.py - Contains serializers for user registration, login, and blog post operations
+from django.db import models
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from rest_framework.authtoken.models import Token
-from .models import User, BlogPost
+from . import hashing, likebuffer
+from .authentication import get_token_expiry_state
+from .instrumentation import timed_serialization
+from .models import User, AuthorStats, BlogPost
 
 class RegisterSerializer(serializers.ModelSerializer):
     """
@@ -14,14 +18,38 @@ class RegisterSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
-        # Create a new user with the provided validated data
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email', ''),
-            password=validated_data['password']
-        )
+        # Same as User.objects.create_user, with the password hashed in the hashing pool
+        user = build_user(validated_data, hashing.make_password(validated_data['password']))
+        user.save()
         return user
 
+
+def build_user(validated_data, encoded_password):
+    # An unsaved user from validated RegisterSerializer data and an already hashed password
+    return User(
+        username=User.normalize_username(validated_data['username']),
+        email=User.objects.normalize_email(validated_data.get('email', '')),
+        password=encoded_password,
+    )
+
+
+def get_login_token(user):
+    """
+    Returns the token to hand out on login. The token is loaded together with the
+    user by TokenModelBackend; only users without one need a second query to create it.
+    """
+    try:
+        token = user.auth_token
+    except Token.DoesNotExist:
+        token, created = Token.objects.get_or_create(user=user)
+    else:
+        if get_token_expiry_state(token) == 'expired':
+            # Replace a token that can no longer authenticate
+            token.delete()
+            token = Token.objects.create(user=user)
+    return token
+
+
 class LoginSerializer(serializers.Serializer):
     """
     Serializer for user login. Validates credentials and returns token.
@@ -38,10 +66,43 @@ class LoginSerializer(serializers.Serializer):
         if user is None:
             raise serializers.ValidationError('Invalid username or password')
 
-        # Create a token for the user
-        token, created = Token.objects.get_or_create(user=user)
+        return {'token': get_login_token(user).key}
 
-        return {'token': token.key}
+def get_liked_post_ids(user, post_ids):
+    """
+    Returns the subset of ``post_ids`` liked by ``user`` using one ``IN`` lookup on
+    the likes through table.
+    """
+    if not post_ids or user is None or not user.is_authenticated:
+        return set()
+    Like = BlogPost.likes.through
+    liked_post_ids = set(
+        Like.objects.filter(user_id=user.pk, blogpost_id__in=post_ids).values_list('blogpost_id', flat=True)
+    )
+    # Toggles still in the write-behind buffer, so users see their own likes at once
+    return likebuffer.overlay_liked_post_ids(user, post_ids, liked_post_ids)
+
+class BlogPostListSerializer(serializers.ListSerializer):
+    """
+    List serializer used for BlogPostSerializer(many=True).
+
+    Resolves 'liked_by_me' for the whole page up front with a single membership query
+    and shares the result with the child serializer through the context, so a page
+    costs one extra query however many posts it holds. 'like_count' comes from the
+    denormalized column and needs no query at all.
+    """
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        posts = list(iterable)
+        if 'liked_post_ids' not in self.context:
+            # Callers that already resolved like state (e.g. the async views) pass it in
+            request = self.context.get('request', None)
+            self.context['liked_post_ids'] = get_liked_post_ids(
+                getattr(request, 'user', None), [post.pk for post in posts]
+            )
+        with timed_serialization():
+            data = super().to_representation(posts)
+        return likebuffer.overlay_like_counts(data, [post.pk for post in posts])
 
 class BlogPostSerializer(serializers.ModelSerializer):
     """
@@ -52,13 +113,97 @@ class BlogPostSerializer(serializers.ModelSerializer):
     are included in API responses but cannot be set or modified by the user. This is important for
     fields that are auto-generated or managed by the system for security and data integrity.
     """
+    liked_by_me = serializers.SerializerMethodField()
+
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'content', 'author', 'created_at']
-        read_only_fields = ['id', 'author', 'created_at']
+        fields = ['id', 'title', 'content', 'author', 'created_at', 'like_count', 'liked_by_me']
+        read_only_fields = ['id', 'author', 'created_at', 'like_count']
+        list_serializer_class = BlogPostListSerializer
+
+    def to_representation(self, instance):
+        if self.parent is not None:
+            # Already timed, and like counts overlaid, by the list serializer
+            return super().to_representation(instance)
+        with timed_serialization():
+            data = super().to_representation(instance)
+        return likebuffer.overlay_like_counts([data], [instance.pk])[0]
+
+    def get_liked_by_me(self, obj):
+        liked_post_ids = self.context.get('liked_post_ids', None)
+        if liked_post_ids is None:
+            # Serializing a single post outside of a list
+            request = self.context.get('request', None)
+            liked_post_ids = get_liked_post_ids(getattr(request, 'user', None), [obj.pk])
+        return obj.pk in liked_post_ids
 
     def create(self, validated_data):
         request = self.context.get('request', None)
         if request and hasattr(request, 'user'):
             validated_data['author'] = request.user
         return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        # Writes only the submitted columns, so counters changed meanwhile are kept
+        for name, value in validated_data.items():
+            setattr(instance, name, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+class BlogPostSummarySerializer(BlogPostSerializer):
+    """
+    BlogPostSerializer with the stored excerpt and content length, restricted to the
+    names passed as ``fields`` (the summary fields by default). Lists using it defer
+    ``content`` unless it was asked for.
+    """
+    SUMMARY_FIELDS = ('id', 'title', 'excerpt', 'content_length', 'author', 'created_at', 'like_count',
+                      'liked_by_me')
+
+    class Meta(BlogPostSerializer.Meta):
+        fields = BlogPostSerializer.Meta.fields + ['excerpt', 'content_length']
+        read_only_fields = BlogPostSerializer.Meta.read_only_fields + ['excerpt', 'content_length']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = set(fields or self.SUMMARY_FIELDS)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuthorStats
+        fields = ['post_count', 'likes_received', 'top_post', 'top_post_like_count', 'updated_at']
+        read_only_fields = fields
+
+
+def get_requested_fields(request):
+    """
+    Returns the field names asked for with ``?view=summary`` or ``?fields=a,b``, or
+    None for the full BlogPostSerializer representation. Unknown names are a 400.
+    """
+    params = request.query_params
+    if params.get('fields'):
+        fields = tuple(dict.fromkeys(name.strip() for name in params['fields'].split(',') if name.strip()))
+        unknown = [name for name in fields if name not in BlogPostSummarySerializer.Meta.fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': f'Unknown field(s): {", ".join(unknown)}.'})
+        return fields
+    if params.get('view') == 'summary':
+        return BlogPostSummarySerializer.SUMMARY_FIELDS
+    return None
+
+
+def defer_unrequested(queryset, fields):
+    # Only a full representation or an explicit request needs the content column
+    if fields is not None and 'content' not in fields:
+        return queryset.defer('content')
+    return queryset
+
+
+def serialize_posts(posts, fields, context):
+    # Full representation when ``fields`` is None, otherwise the requested subset
+    if fields is None:
+        return BlogPostSerializer(posts, many=True, context=context).data
+    return BlogPostSummarySerializer(posts, many=True, fields=fields, context=context).data
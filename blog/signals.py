@@ -0,0 +1,194 @@
+# signals.py - Keeps denormalized blog data in sync with model changes
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import events
+from .authentication import get_token_cache
+from .cache import bump_list_version
+from .models import AuthorStats, BlogPost, like_count_update, like_toggled, posts_bulk_created
+
+
+@receiver(m2m_changed, sender=BlogPost.likes.through)
+def sync_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps ``BlogPost.like_count``, and with it ``trending_score``, correct when likes
+    are changed through the related managers (``post.likes.add()``, ``user.liked_posts.remove()``, ...).
+    ``BlogPost.objects.toggle_like`` updates the count itself.
+    """
+    if action == 'pre_remove':
+        # pk_set holds every id passed to remove(), liked or not; only existing rows count
+        if reverse:
+            instance._removed_liked_post_ids = list(sender.objects.filter(
+                user_id=instance.pk, blogpost_id__in=pk_set).values_list('blogpost_id', flat=True))
+        else:
+            instance._removed_like_count = sender.objects.filter(blogpost_id=instance.pk, user_id__in=pk_set).count()
+    elif action == 'pre_clear' and reverse:
+        # Remember which posts lose a like before the rows are gone
+        instance._cleared_liked_post_ids = list(
+            sender.objects.filter(user_id=instance.pk).values_list('blogpost_id', flat=True)
+        )
+    elif action == 'post_clear':
+        if reverse:
+            post_ids = getattr(instance, '_cleared_liked_post_ids', [])
+            BlogPost.objects.filter(pk__in=post_ids).update(**like_count_update(F('like_count') - 1))
+        else:
+            BlogPost.objects.filter(pk=instance.pk).update(**like_count_update(Value(0)))
+    elif action == 'post_add' and pk_set:
+        # add() only reports the rows it inserted
+        if reverse:
+            BlogPost.objects.filter(pk__in=pk_set).update(**like_count_update(F('like_count') + 1))
+        else:
+            BlogPost.objects.filter(pk=instance.pk).update(**like_count_update(F('like_count') + len(pk_set)))
+    elif action == 'post_remove':
+        if reverse:
+            post_ids = getattr(instance, '_removed_liked_post_ids', [])
+            if post_ids:
+                BlogPost.objects.filter(pk__in=post_ids).update(**like_count_update(F('like_count') - 1))
+        else:
+            removed = getattr(instance, '_removed_like_count', 0)
+            if removed:
+                BlogPost.objects.filter(pk=instance.pk).update(**like_count_update(F('like_count') - removed))
+
+
+@receiver(m2m_changed, sender=BlogPost.likes.through)
+def sync_author_stats_on_like(sender, instance, action, reverse, pk_set, **kwargs):
+    # Runs after sync_like_count; these bulk changes are rare, so the authors are recounted
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        AuthorStats.objects.rebuild([instance.author_id])
+        return
+    post_ids = pk_set if pk_set is not None else getattr(instance, '_cleared_liked_post_ids', [])
+    author_ids = set(BlogPost.objects.filter(pk__in=post_ids).values_list('author_id', flat=True))
+    if author_ids:
+        AuthorStats.objects.rebuild(author_ids)
+
+
+@receiver(post_save, sender=BlogPost)
+def count_created_post(sender, instance, created, **kwargs):
+    # BlogPost.save() runs the insert and this in one transaction
+    if created:
+        AuthorStats.objects.record_posts(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=BlogPost)
+def count_deleted_post(sender, instance, **kwargs):
+    # Sent inside the deletion's transaction
+    AuthorStats.objects.record_delete(instance.author_id, instance.like_count)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_post_list_on_write(sender, instance, **kwargs):
+    # Create, update and delete all change the author's cached post list
+    bump_list_version(instance.author_id)
+
+
+@receiver(post_save, sender=BlogPost)
+def add_post_to_feed(sender, instance, created, **kwargs):
+    # Edits need nothing: the feed loads the current post rows on every read.
+    # The timeline is shared, so it only changes once the write has committed.
+    if created and settings.BLOG_FEED['ENABLED']:
+        from .feed import FeedTimeline
+        transaction.on_commit(lambda: FeedTimeline().push([instance]))
+
+
+@receiver(posts_bulk_created)
+def add_bulk_posts_to_feed(sender, posts, **kwargs):
+    if settings.BLOG_FEED['ENABLED']:
+        from .feed import FeedTimeline
+        posts = list(posts)
+        transaction.on_commit(lambda: FeedTimeline().push(posts))
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_post_from_feed(sender, instance, **kwargs):
+    if settings.BLOG_FEED['ENABLED']:
+        from .feed import FeedTimeline
+        post_id = instance.pk
+        transaction.on_commit(lambda: FeedTimeline().remove([post_id]))
+
+
+@receiver(m2m_changed, sender=BlogPost.likes.through)
+def invalidate_post_list_on_like(sender, instance, action, reverse, pk_set, **kwargs):
+    # Like counts and liked_by_me are part of the author's cached post list
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_list_version(instance.author_id)
+        return
+    post_ids = pk_set if pk_set is not None else getattr(instance, '_cleared_liked_post_ids', [])
+    author_ids = set(BlogPost.objects.filter(pk__in=post_ids).values_list('author_id', flat=True))
+    if author_ids:
+        bump_list_version(*author_ids)
+
+
+@receiver(like_toggled)
+@receiver(posts_bulk_created)
+def invalidate_post_list_on_bulk_write(sender, author_id, **kwargs):
+    # Writes that bypass the model signals send these instead
+    bump_list_version(author_id)
+
+
+def publish_on_commit(type, data):
+    # Subscribers must never hear about a write that is rolled back
+    if settings.BLOG_EVENTS['ENABLED']:
+        transaction.on_commit(lambda: events.publish(type, data))
+
+
+@receiver(post_save, sender=BlogPost)
+def publish_post_created(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit(events.POST_CREATED, events.post_created_data(instance))
+
+
+@receiver(posts_bulk_created)
+def publish_bulk_posts_created(sender, posts, **kwargs):
+    for post in posts:
+        publish_on_commit(events.POST_CREATED, events.post_created_data(post))
+
+
+@receiver(post_delete, sender=BlogPost)
+def publish_post_deleted(sender, instance, **kwargs):
+    publish_on_commit(events.POST_DELETED, {'id': instance.pk, 'author': instance.author_id})
+
+
+@receiver(like_toggled)
+def publish_toggled_like_count(sender, post_id, like_count, **kwargs):
+    publish_on_commit(events.LIKE_COUNT_CHANGED, {'id': post_id, 'like_count': like_count})
+
+
+@receiver(m2m_changed, sender=BlogPost.likes.through)
+def publish_like_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    # Runs after sync_like_count, so the counts read here are the new ones
+    if action not in ('post_add', 'post_remove', 'post_clear') or not settings.BLOG_EVENTS['ENABLED']:
+        return
+    if not reverse:
+        post_ids = [instance.pk]
+    else:
+        post_ids = pk_set if pk_set is not None else getattr(instance, '_cleared_liked_post_ids', [])
+    for post_id, like_count in BlogPost.objects.filter(pk__in=post_ids).values_list('pk', 'like_count'):
+        publish_on_commit(events.LIKE_COUNT_CHANGED, {'id': post_id, 'like_count': like_count})
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    # Logout deletes the token; it must stop authenticating straight away
+    get_token_cache().invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def evict_user_tokens(sender, instance, created, **kwargs):
+    # Cached tokens carry a copy of the user, so drop them when the user changes
+    if created:
+        return
+    token_cache = get_token_cache()
+    token_cache.invalidate_user(instance.pk)
+    if token_cache.shared is not None:
+        for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+            token_cache.invalidate(key)
@@ -1,10 +1,36 @@
 from rest_framework import status
-from django.test import TestCase
-from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.conf import settings
+from asgiref.sync import iscoroutinefunction
+import csv
+import gzip
+import json
+import threading
+import time
+from unittest import mock
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APITestCase, APITransactionTestCase
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from .models import BlogPost
+from .management.commands import bench_startup
+from .cache import PostListCache, get_list_version
+from .feed import FeedTimeline
+from .middleware import CompressionMiddleware, InstrumentationMiddleware, ReadYourWritesMiddleware
+from .models import AuthorStats, BlogPost, trending_score
+from .routers import PrimaryReplicaRouter
+from . import benchmarks, events, hashing, likebuffer
 from .serializers import BlogPostSerializer
+from .throttling import LoginFailureThrottle
 from rest_framework.authtoken.models import Token
 
 class BlogPostCreateViewTestCase(APITestCase):
@@ -90,6 +116,30 @@ class BlogPostUpdateViewTestCase(APITestCase):
         self.assertEqual(self.blog_post.title, 'Partially Updated Title')
         self.assertEqual(self.blog_post.content, 'Original content.')
 
+    def test_update_keeps_counters_changed_meanwhile(self):
+        stale = BlogPost.objects.get(pk=self.blog_post.pk)
+        self.blog_post.likes.add(self.user)
+        serializer = BlogPostSerializer(stale, data={'title': 'Edited'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.blog_post.refresh_from_db()
+        self.assertEqual((self.blog_post.title, self.blog_post.like_count), ('Edited', 1))
+
+# Outside a test transaction, so the router's replica routing is in effect
+class BlogPostUpdateRoutingTestCase(APITransactionTestCase):
+
+    @override_settings(BLOG_DB_ROUTING={'REPLICAS': ['missing-replica'], 'PIN_SECONDS': 0})
+    def test_update_reads_primary(self):
+        user = User.objects.create_user(username='editor', password='testpass123')
+        post = BlogPost.objects.create(title='Routed', content='Original content.', author=user)
+        self.client.force_authenticate(user=user)
+        # Reading the post from the (unknown) replica alias would fail the request
+        response = self.client.patch(reverse('blog-post-edit', args=[post.id]), {'content': 'From the primary.'},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        post.refresh_from_db(using='default')
+        self.assertEqual(post.excerpt, 'From the primary.')
+
 class BlogAPIIntegrationTestCase(APITestCase):
     # Test case for complete blog API integration
     def test_complete_blog_flow(self):
@@ -258,3 +308,1621 @@ class LikePostFlowTest(APITestCase):
         response = self.client.post(f'/api/blogs/{post_id}/like/')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['status'], 'post unliked')
+
+# for keyset pagination of the blog post list
+class BlogPostListPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='pageuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content='Paged content', author=self.user)
+            for i in range(7)
+        ]
+        # Share one timestamp across some rows so the id tie-breaker is exercised
+        BlogPost.objects.filter(id__in=[p.id for p in self.posts[2:5]]).update(
+            created_at=self.posts[2].created_at
+        )
+        self.url = reverse('blog-post-list')
+
+    def test_unpaginated_list_unchanged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 7)
+
+    def test_pages_cover_all_posts_once(self):
+        seen = []
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertIsNone(response.data['previous'])
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(post['id'] for post in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        expected = list(BlogPost.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(self.url, {'page_size': 3})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [post['id'] for post in back.data['results']],
+            [post['id'] for post in first.data['results']],
+        )
+
+    def test_page_is_single_query(self):
+        first = self.client.get(self.url, {'page_size': 2})
+        # One query for the page, one for the liked_by_me membership lookup
+        with self.assertNumQueries(2):
+            response = self.client.get(first.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+# for the denormalized like counter
+class LikeCountTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='liker', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.post = BlogPost.objects.create(title='Counted', content='Count my likes', author=self.other)
+        self.like_url = reverse('blog-post-like', kwargs={'post_id': self.post.id})
+
+    def test_toggle_returns_like_count(self):
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.data, {'status': 'post liked', 'like_count': 1})
+        self.assertTrue(self.post.likes.filter(id=self.user.id).exists())
+
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.data, {'status': 'post unliked', 'like_count': 0})
+        self.assertFalse(self.post.likes.filter(id=self.user.id).exists())
+
+    def test_count_tracks_related_manager_changes(self):
+        self.post.likes.add(self.user, self.other)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+
+        self.other.liked_posts.remove(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.data['like_count'], 0)
+
+        self.post.likes.add(self.other)
+        self.post.likes.clear()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_removing_users_who_never_liked(self):
+        never = User.objects.create_user(username='never', password='testpass123')
+        self.post.likes.add(self.other)
+        self.post.likes.remove(self.user, self.other, never)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+        self.post.likes.remove(never)
+        never.liked_posts.remove(self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+# for bulk like-state resolution in serialized lists
+class BlogPostLikeStateTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.fan = User.objects.create_user(username='fan', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content='Content', author=self.user)
+            for i in range(5)
+        ]
+        self.posts[0].likes.add(self.user, self.fan)
+        self.posts[3].likes.add(self.fan)
+
+    def test_list_includes_like_state(self):
+        response = self.client.get(reverse('blog-post-list'))
+        by_id = {post['id']: post for post in response.data}
+        self.assertEqual(by_id[self.posts[0].id]['like_count'], 2)
+        self.assertTrue(by_id[self.posts[0].id]['liked_by_me'])
+        self.assertEqual(by_id[self.posts[3].id]['like_count'], 1)
+        self.assertFalse(by_id[self.posts[3].id]['liked_by_me'])
+        self.assertEqual(by_id[self.posts[1].id]['like_count'], 0)
+
+    def test_list_like_state_query_count_is_flat(self):
+        # One query for the posts and one membership lookup, regardless of page size
+        with self.assertNumQueries(2):
+            self.client.get(reverse('blog-post-list'))
+        for i in range(10):
+            BlogPost.objects.create(title=f'Extra {i}', content='Content', author=self.user).likes.add(self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('blog-post-list'))
+        self.assertEqual(len(response.data), 15)
+
+# for the cached token authentication backend, with the default cache as shared tier
+SHARED_TOKEN_CACHE = {'MAX_SIZE': 100, 'TTL': 300, 'SHARED_CACHE': 'default'}
+
+
+@override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'}, BLOG_TOKEN_CACHE=SHARED_TOKEN_CACHE)
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        from .authentication import get_token_cache
+        get_token_cache().clear()
+        self.user = User.objects.create_user(username='cacheduser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('blog-post-list')
+
+    def test_cache_hit_skips_token_lookup(self):
+        with self.assertNumQueries(2):
+            # Token lookup plus the (empty) post list
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_invalidates_cached_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, 204)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_deactivated_user_is_evicted(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_reaches_other_workers(self):
+        from .authentication import TokenCache
+        worker, other_worker = TokenCache(shared_alias='default'), TokenCache(shared_alias='default')
+        worker.set(self.token.key, self.token)
+        self.assertEqual(worker.get(self.token.key), self.token)
+        other_worker.invalidate(self.token.key)
+        self.assertIsNone(worker.get(self.token.key))
+        self.assertIsNone(worker.get_local(self.token.key))
+
+    @override_settings(BLOG_TOKEN_CACHE={'MAX_SIZE': 100, 'TTL': 300, 'SHARED_CACHE': None, 'LOCAL_TTL': 5})
+    def test_short_local_tier_without_shared_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        now = time.monotonic()
+        with mock.patch('blog.authentication.time.monotonic', return_value=now + 6):
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+        # Logging out on this worker applies at once
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        with self.settings(BLOG_TOKEN_CACHE={'MAX_SIZE': 100, 'TTL': 300, 'LOCAL_TTL': 0}):
+            token = Token.objects.create(user=self.user)
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+            self.client.get(self.url)
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+
+# for the read-through post list cache
+@override_settings(BLOG_LIST_CACHE={'ENABLED': True, 'ALIAS': 'default'})
+class BlogPostListCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.post = BlogPost.objects.create(title='Cached', content='Cached content', author=self.user)
+        self.url = reverse('blog-post-list')
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertIn('ETag', first)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_cached_list(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog-post-create'), {'title': 'New', 'content': 'New content'}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('blog-post-edit', args=[self.post.id]), {'title': 'Edited'}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Edited', [post['title'] for post in response.data])
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog-post-like', kwargs={'post_id': self.post.id}))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        liked = [post for post in response.data if post['id'] == self.post.id][0]
+        self.assertTrue(liked['liked_by_me'])
+        etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('blog-post-delete', kwargs={'pk': self.post.id}))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_version_moves_only_on_commit(self):
+        etag = self.client.get(self.url)['ETag']
+        try:
+            with transaction.atomic():
+                BlogPost.objects.create(title='Rolled back', content='Body', author=self.user)
+                # Not committed yet: readers keep the old version
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+# for batch post creation
+class BlogPostBatchCreateViewTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('blog-post-batch-create')
+
+    def test_create_batch_from_json_array(self):
+        data = [{'title': f'Imported {i}', 'content': f'Body {i}'} for i in range(25)]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(
+            list(BlogPost.objects.filter(id__in=ids).order_by('id').values_list('title', flat=True)),
+            [f'Imported {i}' for i in range(25)],
+        )
+        self.assertEqual(BlogPost.objects.filter(author=self.user).count(), 25)
+
+    def test_create_batch_from_ndjson(self):
+        body = '{"title": "First", "content": "One"}\n\n{"title": "Second", "content": "Two"}\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(BlogPost.objects.count(), 2)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        data = [{'title': 'Fine', 'content': 'Fine'}, {'title': 'No content'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['errors'], {})
+        self.assertIn('content', response.data['results'][1]['errors'])
+        self.assertEqual(BlogPost.objects.count(), 0)
+
+    @override_settings(BLOG_BATCH_CREATE={'MAX_SIZE': 100, 'CHUNK_SIZE': 10})
+    def test_insert_queries_scale_with_chunks(self):
+        data = [{'title': f'Post {i}', 'content': 'Body'} for i in range(30)]
+        with self.assertNumQueries(8):
+            # Savepoint, three chunked INSERTs, the author's stats (an UPDATE finding no
+            # row, then the two-query rebuild of a first-time author), release
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_rejects_non_list_body(self):
+        response = self.client.post(self.url, {'title': 'Single'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+# for full-text search
+class BlogPostSearchViewTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='testpass123')
+        self.other = User.objects.create_user(username='stranger', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('blog-post-search')
+        self.title_match = BlogPost.objects.create(title='Django tips', content='Some notes', author=self.user)
+        self.content_match = BlogPost.objects.create(
+            title='Weekend', content='Went hiking, then read about django models', author=self.user
+        )
+        BlogPost.objects.create(title='Unrelated', content='Nothing to see', author=self.user)
+        BlogPost.objects.create(title='Django elsewhere', content='Not mine', author=self.other)
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(self.url, {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.title_match.id, self.content_match.id],
+        )
+
+    def test_index_follows_updates_and_deletes(self):
+        self.title_match.title = 'Flask tips'
+        self.title_match.save()
+        self.content_match.delete()
+        response = self.client.get(self.url, {'q': 'django'})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(self.url, {'q': 'flask'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.title_match.id])
+
+    def test_search_is_paginated(self):
+        BlogPost.objects.create(title='More django', content='Django again', author=self.user)
+        first = self.client.get(self.url, {'q': 'django', 'page_size': 2})
+        self.assertEqual(len(first.data['results']), 2)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['next'])
+        ids = [post['id'] for post in first.data['results'] + second.data['results']]
+        self.assertEqual(len(set(ids)), 3)
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        response = self.client.get(self.url, {'q': 'django" OR NEAR(*'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_query(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_databases_answer_not_implemented(self):
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            response = self.client.get(self.url, {'q': 'django'})
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.data['detail'], 'Full-text search is not available on this database.')
+
+
+# for the native async views
+class AsyncURLConf:
+    from .async_views import AsyncBlogPostCreateView, AsyncBlogPostListView, AsyncLikePostView, AsyncLoginView, \
+        AsyncRegisterView
+
+    urlpatterns = [
+        path('api/register/', AsyncRegisterView.as_view(), name='register'),
+        path('api/login/', AsyncLoginView.as_view(), name='login'),
+        path('api/create/', AsyncBlogPostCreateView.as_view(), name='blog-post-create'),
+        path('api/blogs/', AsyncBlogPostListView.as_view(), name='blog-post-list'),
+        path('api/blogs/<int:post_id>/like/', AsyncLikePostView.as_view(), name='blog-post-like'),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewsTestCase(APITestCase):
+
+    def setUp(self):
+        from .authentication import get_token_cache
+        get_token_cache().clear()
+        cache.clear()
+        self.user = User.objects.create_user(username='asyncuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_create_list_and_like(self):
+        response = self.client.post(reverse('blog-post-create'), {'title': 'Async', 'content': 'Body'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        post_id = response.json()['id']
+        self.assertEqual(BlogPost.objects.get(id=post_id).author, self.user)
+
+        response = self.client.post(reverse('blog-post-like', kwargs={'post_id': post_id}))
+        self.assertEqual(response.json(), {'status': 'post liked', 'like_count': 1})
+
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertEqual(response.status_code, 200)
+        [post] = response.json()
+        self.assertEqual(post['id'], post_id)
+        self.assertTrue(post['liked_by_me'])
+        self.assertEqual(post['like_count'], 1)
+
+        response = self.client.get(reverse('blog-post-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_matches_sync_list_output(self):
+        for i in range(3):
+            BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.user)
+        async_response = self.client.get(reverse('blog-post-list'), {'page_size': 2})
+        with self.settings(ROOT_URLCONF='Assignment2_backend.urls'):
+            sync_response = self.client.get(reverse('blog-post-list'), {'page_size': 2})
+        self.assertEqual(async_response.content, sync_response.content)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'}, BLOG_FAST_PATH={'ENABLED': True})
+    def test_fast_path_matches_sync_list_output(self):
+        for i in range(3):
+            BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.user)
+        async_response = self.client.get(reverse('blog-post-list'), {'page_size': 2})
+        with self.settings(ROOT_URLCONF='Assignment2_backend.urls', BLOG_FAST_PATH={'ENABLED': False}):
+            sync_response = self.client.get(reverse('blog-post-list'), {'page_size': 2})
+        self.assertEqual(async_response.content, sync_response.content)
+
+    def test_summary_and_invalid_fields(self):
+        BlogPost.objects.create(title='Post', content='Body', author=self.user)
+        [post] = self.client.get(reverse('blog-post-list'), {'view': 'summary'}).json()
+        self.assertEqual((post['excerpt'], post['content_length']), ('Body', 4))
+        self.assertNotIn('content', post)
+        self.assertEqual(self.client.get(reverse('blog-post-list'), {'fields': 'nope'}).status_code, 400)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_conditional_get_without_list_cache(self):
+        BlogPost.objects.create(title='Post', content='Body', author=self.user)
+        response = self.client.get(reverse('blog-post-list'))
+        response = self.client.get(reverse('blog-post-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_validation_and_missing_post(self):
+        response = self.client.post(reverse('blog-post-create'), {'title': 'No content'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('content', response.json())
+        response = self.client.post(reverse('blog-post-like', kwargs={'post_id': 999}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_accepts_form_bodies(self):
+        response = self.client.post(reverse('blog-post-create'), {'title': 'Multipart', 'content': 'Body'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(reverse('blog-post-create'), 'title=Form&content=Body',
+                                    content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(BlogPost.objects.values_list('title', flat=True)), {'Multipart', 'Form'})
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': True, 'ALIAS': 'default', 'TIMEOUT': 300})
+    def test_list_cache_is_read_without_blocking_calls(self):
+        from .async_views import AsyncBlogPostListView
+        BlogPost.objects.create(title='Post', content='Body', author=self.user)
+        first = self.client.get(reverse('blog-post-list'))
+        with mock.patch.object(PostListCache, 'get', side_effect=AssertionError), \
+                mock.patch.object(AsyncBlogPostListView, 'get_list_data', side_effect=AssertionError):
+            second = self.client.get(reverse('blog-post-list'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_requires_valid_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('blog-post-list')).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        self.assertEqual(self.client.get(reverse('blog-post-list')).status_code, 401)
+
+    def test_expired_token_is_rejected(self):
+        Token.objects.filter(pk=self.token.pk).update(
+            created=timezone.now() - timedelta(seconds=settings.BLOG_TOKEN_EXPIRY['TTL'] + 1))
+        self.assertEqual(self.client.get(reverse('blog-post-list')).status_code, 401)
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+# for query budgets of every endpoint, shared with the benchmark suite
+class QueryBudgetTestCase(APITestCase):
+
+    def setUp(self):
+        from .authentication import get_token_cache
+        get_token_cache().clear()
+        cache.clear()
+        self.fixtures = benchmarks.seed(users=3, posts_per_user=5, likes_per_post=2)
+
+    def test_endpoints_stay_within_query_budgets(self):
+        results = benchmarks.run_benchmark(self.fixtures, requests=3, concurrency=1)
+        for endpoint, result in results.items():
+            self.assertEqual(result['errors'], 0, endpoint)
+        self.assertEqual(benchmarks.check_budgets(results), [])
+
+    def test_seed_builds_author_stats(self):
+        user = self.fixtures.users[0]
+        stats = AuthorStats.objects.get(pk=user.pk)
+        self.assertEqual(stats.post_count, 5)
+        self.assertEqual(stats.likes_received, 10)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 11))
+        self.assertEqual(benchmarks.percentile(values, 0.3), 3)
+        self.assertEqual(benchmarks.percentile(values, 0.5), 5)
+        self.assertEqual(benchmarks.percentile(values, 0.95), 10)
+        self.assertEqual(benchmarks.percentile(values, 0.0), 1)
+        self.assertIsNone(benchmarks.percentile([], 0.5))
+
+# for the instrumentation middleware and metrics endpoint
+class InstrumentationMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        from .instrumentation import registry
+        registry.reset()
+        cache.clear()
+        self.user = User.objects.create_user(username='measured', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        BlogPost.objects.create(title='Measured', content='Body', author=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertIn('Server-Timing', response)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_metrics_endpoint_exposes_histograms(self):
+        self.client.get(reverse('blog-post-list'))
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE blog_request_duration_seconds histogram', body)
+        self.assertIn('blog_db_queries_count{view="blog-post-list",method="GET",status="200"} 1', body)
+        self.assertIn('blog_db_queries_bucket{view="blog-post-list",method="GET",status="200",le="2"} 1', body)
+
+    @override_settings(BLOG_METRICS={'ENABLED': True, 'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'TOKEN': 's3cret'})
+    def test_metrics_need_staff_or_bearer_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(BLOG_METRICS={'ENABLED': True, 'SAMPLE_RATE': 0.0, 'SERVER_TIMING': True})
+    def test_unsampled_requests_are_not_measured(self):
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_middleware_follows_the_chain_mode(self):
+        async def async_view(request):
+            return HttpResponse()
+
+        for middleware in (InstrumentationMiddleware, ReadYourWritesMiddleware, CompressionMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware(async_view)))
+            self.assertFalse(iscoroutinefunction(middleware(lambda request: HttpResponse())))
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_view_queries_are_measured(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get(reverse('blog-post-list'),
+                                               headers={'Authorization': 'Token ' + token.key})
+        self.assertEqual(response.status_code, 200)
+        # Run in sync_to_async threads, outside the middleware's own thread
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+# for the login pipeline: token loading, rehash-on-login and failure throttle
+@override_settings(BLOG_PASSWORD_HASHING={**settings.BLOG_PASSWORD_HASHING, 'PBKDF2_ITERATIONS': 1000})
+class LoginPipelineTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='loginuser', password='testpass123')
+        self.url = reverse('login')
+        self.credentials = {'username': 'loginuser', 'password': 'testpass123'}
+
+    def test_login_with_existing_token_is_one_query(self):
+        token = Token.objects.create(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, self.credentials, format='json')
+        self.assertEqual(response.data, {'token': token.key})
+
+    def test_login_creates_missing_token(self):
+        response = self.client.post(self.url, self.credentials, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Token.objects.get(user=self.user).key, response.data['token'])
+
+    def test_password_is_rehashed_at_configured_cost(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(BLOG_PASSWORD_HASHING={**settings.BLOG_PASSWORD_HASHING, 'PBKDF2_ITERATIONS': 2000}):
+            response = self.client.post(self.url, self.credentials, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    @override_settings(BLOG_LOGIN_THROTTLE={'MAX_FAILURES': 3, 'WINDOW': 60, 'ALIAS': 'default'})
+    def test_repeated_failures_are_throttled_before_hashing(self):
+        wrong = {'username': 'loginuser', 'password': 'wrong'}
+        for _ in range(3):
+            self.assertEqual(self.client.post(self.url, wrong, format='json').status_code, 400)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, self.credentials, format='json')
+        self.assertEqual(response.status_code, 429)
+        # Other usernames are unaffected
+        User.objects.create_user(username='otheruser', password='testpass123')
+        response = self.client.post(self.url, {'username': 'otheruser', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(BLOG_LOGIN_THROTTLE={'MAX_FAILURES': 3, 'WINDOW': 60, 'ALIAS': 'default'})
+    def test_successful_login_resets_failures(self):
+        wrong = {'username': 'loginuser', 'password': 'wrong'}
+        for _ in range(2):
+            self.client.post(self.url, wrong, format='json')
+        self.assertEqual(self.client.post(self.url, self.credentials, format='json').status_code, 200)
+        for _ in range(2):
+            self.client.post(self.url, wrong, format='json')
+        self.assertEqual(self.client.post(self.url, self.credentials, format='json').status_code, 200)
+
+    def test_scrypt_hasher_verifies_and_upgrades(self):
+        scrypt = {**settings.BLOG_PASSWORD_HASHING, 'SCRYPT_WORK_FACTOR': 2 ** 10}
+        hashers = ['blog.hashers.TunedScryptPasswordHasher', 'blog.hashers.TunedPBKDF2PasswordHasher']
+        with self.settings(PASSWORD_HASHERS=hashers, BLOG_PASSWORD_HASHING=scrypt):
+            response = self.client.post(self.url, self.credentials, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('scrypt$1024$'))
+
+
+# for sliding token expiry, login token replacement and the purge command
+@override_settings(BLOG_TOKEN_EXPIRY={'TTL': 3600, 'RENEW_INTERVAL': 600},
+                   BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'}, BLOG_TOKEN_CACHE=SHARED_TOKEN_CACHE)
+class TokenExpiryTestCase(APITestCase):
+
+    def setUp(self):
+        from .authentication import get_token_cache
+        get_token_cache().clear()
+        cache.clear()
+        self.user = User.objects.create_user(username='expiryuser', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def age_token(self, seconds):
+        created = timezone.now() - timedelta(seconds=seconds)
+        Token.objects.filter(pk=self.token.pk).update(created=created)
+        return created
+
+    def test_fresh_token_is_not_rewritten(self):
+        self.client.get(reverse('blog-post-list'))
+        # Token cache hit, no renewal due: only the list query itself
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('blog-post-list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_use_after_renew_interval_slides_expiry(self):
+        created = self.age_token(900)
+        self.assertEqual(self.client.get(reverse('blog-post-list')).status_code, 200)
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.created, created)
+        # Renewed once; the next request within the interval writes nothing
+        with self.assertNumQueries(1):
+            self.client.get(reverse('blog-post-list'))
+
+    def test_expired_token_is_rejected_and_deleted(self):
+        self.age_token(3601)
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], 'Token has expired.')
+        self.assertFalse(Token.objects.filter(pk=self.token.pk).exists())
+
+    def test_login_replaces_expired_token(self):
+        self.age_token(3601)
+        response = self.client.post(reverse('login'), {'username': 'expiryuser', 'password': 'testpass123'},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['token'], self.token.key)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        self.assertEqual(self.client.get(reverse('blog-post-list')).status_code, 200)
+
+    def test_login_keeps_valid_token(self):
+        response = self.client.post(reverse('login'), {'username': 'expiryuser', 'password': 'testpass123'},
+                                    format='json')
+        self.assertEqual(response.data['token'], self.token.key)
+
+    def test_purge_deletes_only_expired_tokens(self):
+        self.age_token(7200)
+        for i in range(5):
+            user = User.objects.create_user(username=f'stale{i}', password='testpass123')
+            Token.objects.create(user=user)
+        fresh = Token.objects.create(user=User.objects.create_user(username='fresh', password='testpass123'))
+        Token.objects.exclude(pk=fresh.pk).update(created=timezone.now() - timedelta(seconds=7200))
+        call_command('purge_expired_tokens', chunk_size=2, stdout=StringIO())
+        self.assertEqual(list(Token.objects.values_list('pk', flat=True)), [fresh.pk])
+
+
+# for the public feed served from the precomputed timeline
+@override_settings(BLOG_FEED={'ENABLED': True, 'ALIAS': 'default', 'SIZE': 3, 'TIMEOUT': 300})
+class FeedViewTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpass123')
+        self.bob = User.objects.create_user(username='bob', password='testpass123')
+        self.url = reverse('feed')
+
+    def create_posts(self, count):
+        return [
+            BlogPost.objects.create(title=f'Post {i}', content='Body', author=(self.alice, self.bob)[i % 2]).pk
+            for i in range(count)
+        ]
+
+    def read_all(self, page_size):
+        ids, url = [], f'{self.url}?page_size={page_size}'
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(post['id'] for post in data['results'])
+            url = data['next']
+        return ids
+
+    def test_anonymous_feed_lists_all_authors_newest_first(self):
+        post_ids = self.create_posts(2)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([post['id'] for post in results], post_ids[::-1])
+        self.assertEqual({post['author'] for post in results}, {self.alice.pk, self.bob.pk})
+        self.assertFalse(any(post['liked_by_me'] for post in results))
+
+    def test_timeline_is_updated_incrementally(self):
+        post_ids = self.create_posts(2)
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_id = BlogPost.objects.create(title='New', content='Body', author=self.alice).pk
+            BlogPost.objects.filter(pk=post_ids[0]).delete()
+            BlogPost.objects.get(pk=post_ids[1]).delete()
+        # The timeline is not rebuilt: only the in_bulk hydration query runs
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual([post['id'] for post in response.json()['results']], [new_id])
+
+    def test_bulk_created_posts_enter_the_feed(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            posts = BlogPost.objects.create_batch(self.bob, [{'title': 'A', 'content': 'a'}, {'title': 'B', 'content': 'b'}])
+        response = self.client.get(self.url)
+        self.assertEqual([post['id'] for post in response.json()['results']], [post.pk for post in posts][::-1])
+
+    def test_rolled_back_posts_never_enter_the_timeline(self):
+        [post_id] = self.create_posts(1)
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    BlogPost.objects.create(title='Rolled back', content='Body', author=self.alice)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual([entry[1] for entry in FeedTimeline().load()['entries']], [post_id])
+
+    def test_paging_past_the_window_falls_back_to_the_database(self):
+        post_ids = self.create_posts(7)
+        self.assertEqual(self.read_all(2), post_ids[::-1])
+        with self.settings(BLOG_FEED={**settings.BLOG_FEED, 'ENABLED': False}):
+            self.assertEqual(self.read_all(2), post_ids[::-1])
+
+    def test_previous_link_returns_to_the_first_page(self):
+        self.create_posts(5)
+        first = self.client.get(self.url, {'page_size': 2}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_authenticated_reader_sees_liked_state(self):
+        [post_id] = self.create_posts(1)
+        BlogPost.objects.toggle_like(post_id, self.bob)
+        self.client.force_authenticate(user=self.bob)
+        [post] = self.client.get(self.url).json()['results']
+        self.assertTrue(post['liked_by_me'])
+        self.assertEqual(post['like_count'], 1)
+
+
+# for incrementally maintained trending scores and the trending endpoint
+class TrendingTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        # Fans never log in, so skip password hashing
+        self.fans = User.objects.bulk_create([User(username=f'fan{i}') for i in range(10)])
+
+    def assertScoreIsExact(self, post):
+        post.refresh_from_db()
+        self.assertAlmostEqual(post.trending_score, trending_score(post.like_count, post.created_at), places=6)
+
+    def test_new_post_gets_a_score(self):
+        post = BlogPost.objects.create(title='Post', content='Body', author=self.author)
+        self.assertScoreIsExact(post)
+        [batch_post] = BlogPost.objects.create_batch(self.author, [{'title': 'Batch', 'content': 'Body'}])
+        self.assertScoreIsExact(batch_post)
+
+    def test_likes_move_the_score_incrementally(self):
+        post = BlogPost.objects.create(title='Post', content='Body', author=self.author)
+        for fan in self.fans:
+            BlogPost.objects.toggle_like(post.pk, fan)
+        self.assertScoreIsExact(post)
+        BlogPost.objects.toggle_like(post.pk, self.fans[0])
+        self.assertScoreIsExact(post)
+        # Through the related managers as well
+        post.likes.add(self.fans[0])
+        self.assertScoreIsExact(post)
+        self.fans[1].liked_posts.remove(post)
+        self.assertScoreIsExact(post)
+        post.likes.clear()
+        self.assertScoreIsExact(post)
+
+    def test_endpoint_ranks_by_likes_with_time_decay(self):
+        older = BlogPost.objects.create(title='Older', content='Body', author=self.author)
+        newer = BlogPost.objects.create(title='Newer', content='Body', author=self.author)
+        self.assertEqual([post['id'] for post in self.client.get(reverse('trending')).json()], [newer.pk, older.pk])
+        for fan in self.fans:
+            BlogPost.objects.toggle_like(older.pk, fan)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('trending'), {'limit': 1})
+        self.assertEqual([post['id'] for post in response.json()], [older.pk])
+
+    def test_recompute_command(self):
+        post = BlogPost.objects.create(title='Post', content='Body', author=self.author)
+        BlogPost.objects.filter(pk=post.pk).update(trending_score=0, like_count=3)
+        call_command('recompute_trending', stdout=StringIO())
+        self.assertScoreIsExact(post)
+
+
+# for the read-only serialization fast path of post lists
+class FastPathTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='fastuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        for i, title in enumerate(['Plain', 'Ünïcödé “quotes”', 'Line separator', 'Emoji \U0001F600']):
+            post = BlogPost.objects.create(title=title, content=f'Body {i}\n"quoted"\\', author=self.user)
+            if i % 2:
+                BlogPost.objects.toggle_like(post.pk, self.user)
+
+    def assertSameBytes(self, url, params=None):
+        with self.settings(BLOG_FAST_PATH={'ENABLED': False}):
+            expected = self.client.get(url, params)
+        with self.settings(BLOG_FAST_PATH={'ENABLED': True}):
+            actual = self.client.get(url, params)
+        self.assertEqual(actual.status_code, 200)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_list_output_is_byte_identical(self):
+        self.assertSameBytes(reverse('blog-post-list'))
+        first = self.assertSameBytes(reverse('blog-post-list'), {'page_size': 2}).json()
+        second = self.assertSameBytes(first['next']).json()
+        self.assertSameBytes(second['previous'])
+
+    def test_trending_output_is_byte_identical(self):
+        self.assertSameBytes(reverse('trending'))
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'}, BLOG_FAST_PATH={'ENABLED': True})
+    def test_list_query_count_is_unchanged(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('blog-post-list'))
+
+    def test_benchmark_reports_identical_output(self):
+        result = benchmarks.benchmark_serialization(BlogPost.objects.order_by('-id'), self.user, repeat=1)
+        self.assertEqual(result['rows'], 4)
+        self.assertTrue(result['identical'])
+
+
+# for post summaries, sparse fields and the detail endpoint
+@override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+class BlogPostSummaryTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='summaryuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.long_content = 'word ' * 1000
+        self.post = BlogPost.objects.create(title='Long', content=self.long_content, author=self.user)
+
+    def test_excerpt_and_length_are_stored(self):
+        self.assertEqual(self.post.content_length, len(self.long_content))
+        self.assertTrue(self.post.excerpt.endswith('…'))
+        self.assertLessEqual(len(self.post.excerpt), 200)
+        self.assertTrue(self.long_content.startswith(self.post.excerpt[:-1]))
+        [batch_post] = BlogPost.objects.create_batch(self.user, [{'title': 'Short', 'content': '  a\n b  '}])
+        self.assertEqual((batch_post.excerpt, batch_post.content_length), ('a b', 8))
+
+    def test_edit_refreshes_excerpt(self):
+        url = reverse('blog-post-edit', kwargs={'pk': self.post.pk})
+        self.client.patch(url, {'content': 'Short now'}, format='json')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt, self.post.content_length), ('Short now', 9))
+        self.post.content = 'Saved with update_fields'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.excerpt, 'Saved with update_fields')
+
+    def test_summary_view_skips_content(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog-post-list'), {'view': 'summary'})
+        [post] = response.json()
+        self.assertNotIn('content', post)
+        self.assertEqual(post['excerpt'], self.post.excerpt)
+        self.assertEqual(post['content_length'], len(self.long_content))
+        self.assertFalse(any('"content"' in query['sql'] for query in queries.captured_queries))
+        full = self.client.get(reverse('blog-post-list'))
+        self.assertLess(len(response.content) * 5, len(full.content))
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse('blog-post-list'), {'fields': 'title,id', 'page_size': 1})
+        self.assertEqual(response.json()['results'], [{'id': self.post.pk, 'title': 'Long'}])
+        response = self.client.get(reverse('blog-post-list'), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['fields'])
+
+    def test_summary_on_feed_and_trending(self):
+        for url in (reverse('feed'), reverse('trending')):
+            response = self.client.get(url, {'view': 'summary'})
+            results = response.json()
+            results = results['results'] if isinstance(results, dict) else results
+            self.assertEqual(results[0]['excerpt'], self.post.excerpt)
+            self.assertNotIn('content', results[0])
+
+    def test_fast_path_summary_matches(self):
+        expected = self.client.get(reverse('blog-post-list'), {'fields': 'like_count,title,excerpt'})
+        with self.settings(BLOG_FAST_PATH={'ENABLED': True}):
+            actual = self.client.get(reverse('blog-post-list'), {'fields': 'like_count,title,excerpt'})
+        self.assertEqual(actual.content, expected.content)
+
+    def test_detail_returns_full_content(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(reverse('blog-post-detail', kwargs={'pk': self.post.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['content'], self.long_content)
+        response = self.client.get(reverse('blog-post-detail', kwargs={'pk': self.post.pk + 100}))
+        self.assertEqual(response.status_code, 404)
+
+
+# for response compression and conditional GET
+class CompressionAndConditionalTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='conduser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content='Compressible body. ' * 50, author=self.user)
+            for i in range(5)
+        ]
+
+    def test_large_responses_are_gzipped(self):
+        import gzip
+        plain = self.client.get(reverse('blog-post-list'))
+        response = self.client.get(reverse('blog-post-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+        # Weakened ETags still validate
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(reverse('blog-post-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_small_or_refused_responses_are_not_compressed(self):
+        short = BlogPost.objects.create(title='Short', content='Tiny', author=self.user)
+        response = self.client.get(reverse('blog-post-detail', kwargs={'pk': short.pk}), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get(reverse('blog-post-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_encoding_negotiation(self):
+        from .middleware import select_encoding
+        available = ['zstd', 'br', 'gzip']
+        self.assertEqual(select_encoding('gzip, br, zstd', available), 'zstd')
+        self.assertEqual(select_encoding('gzip;q=1.0, br;q=0.5', available), 'gzip')
+        self.assertEqual(select_encoding('br;q=0, *', available), 'zstd')
+        self.assertEqual(select_encoding('identity', available), None)
+        self.assertEqual(select_encoding('', ['gzip']), None)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': True, 'ALIAS': 'default'})
+    def test_cached_list_sends_last_modified(self):
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('blog-post-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_uncached_list_is_validated_by_etag_only(self):
+        response = self.client.get(reverse('blog-post-list'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        # Deleting an older post leaves the newest updated_at where it was
+        BlogPost.objects.filter(pk=self.posts[0].pk).delete()
+        response = self.client.get(reverse('blog-post-list'), HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 4)
+
+    @override_settings(BLOG_LIST_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_uncached_list_uses_one_aggregate_query(self):
+        response = self.client.get(reverse('blog-post-list'), {'page_size': 2})
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('blog-post-list'), {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # A like on a listed post changes the page
+        BlogPost.objects.toggle_like(self.posts[-1].pk, self.user)
+        response = self.client.get(reverse('blog-post-list'), {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # So does deleting one
+        etag = self.client.get(reverse('blog-post-list'))['ETag']
+        self.posts[0].delete()
+        self.assertEqual(self.client.get(reverse('blog-post-list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_trending_and_feed_conditional_get(self):
+        urls = [
+            reverse('blog-post-detail', kwargs={'pk': self.posts[-1].pk}),
+            reverse('trending'),
+            reverse('feed'),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            with self.assertNumQueries(1):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304, url)
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        BlogPost.objects.toggle_like(self.posts[-1].pk, self.user)
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+
+# for the event broker and the server-sent events stream
+class EventStreamTestCase(APITestCase):
+
+    def setUp(self):
+        events.reset_broker('BLOG_EVENTS')
+        self.user = User.objects.create_user(username='streamer', password='testpass123')
+
+    def test_redis_listener_survives_errors(self):
+        class Stop(BaseException):
+            pass
+
+        class PubSub:
+            def __init__(self, messages):
+                self.messages = messages
+
+            def subscribe(self, channel):
+                pass
+
+            def listen(self):
+                for message in self.messages:
+                    if isinstance(message, BaseException):
+                        raise message
+                    yield message
+
+            def close(self):
+                pass
+
+        event = events.Event(1, events.POST_CREATED, {'id': 1}).to_json()
+        client = mock.Mock()
+        client.pubsub.side_effect = [
+            PubSub([{'data': 'not json'}, {'data': event}, ConnectionError('lost')]),
+            PubSub([{'data': event}, Stop()]),
+        ]
+        redis = mock.Mock()
+        redis.Redis.from_url.return_value = client
+        with mock.patch.object(events, 'redis', redis):
+            broker = events.RedisBroker('redis://')
+        broker._listener = 'running'
+        with mock.patch.object(broker, 'dispatch') as dispatch, mock.patch('blog.events.time.sleep') as sleep, \
+                self.assertLogs('blog.events', 'ERROR') as logs, self.assertRaises(Stop):
+            broker.listen()
+        self.assertEqual(dispatch.call_count, 2)
+        sleep.assert_called_once_with(1)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIsNone(broker._listener)
+
+    async def test_broker_delivers_and_replays(self):
+        broker = events.InProcessBroker(buffer_size=3)
+        subscription, replay = broker.subscribe()
+        self.assertEqual(replay, [])
+        published = [broker.publish(events.POST_CREATED, {'id': i}) for i in range(4)]
+        received = [await subscription.get(1) for _ in published]
+        self.assertEqual([event.id for event in received], [1, 2, 3, 4])
+        self.assertIsNone(await subscription.get(0.01))
+        subscription.close()
+        self.assertFalse(broker.subscribers)
+
+        _, replay = broker.subscribe(last_event_id=2)
+        self.assertEqual([event.id for event in replay], [3, 4])
+        self.assertEqual(broker.subscribe(last_event_id=4)[1], [])
+        # Event 1 has left the buffer, and 9 was never issued by this broker
+        self.assertIsNone(broker.subscribe(last_event_id=0)[1])
+        self.assertIsNone(broker.subscribe(last_event_id=9)[1])
+
+    async def test_slow_subscriber_is_closed(self):
+        broker = events.InProcessBroker(queue_size=2, max_subscribers=1)
+        subscription, _ = broker.subscribe()
+        with self.assertRaises(events.TooManySubscribers):
+            broker.subscribe()
+        for i in range(3):
+            broker.publish(events.POST_DELETED, {'id': i})
+        self.assertIs(await subscription.get(1), events.Subscription.closed)
+
+    async def test_stream_format(self):
+        broker = events.InProcessBroker()
+        broker.publish(events.LIKE_COUNT_CHANGED, {'id': 1, 'like_count': 2})
+        subscription, replay = broker.subscribe(last_event_id=0)
+        stream = events.stream(subscription, replay, heartbeat=0.01)
+        self.assertEqual(await stream.__anext__(), 'retry: 3000\n\n')
+        self.assertEqual(await stream.__anext__(),
+                         'id: 1\nevent: like-count-changed\ndata: {"id":1,"like_count":2}\n\n')
+        self.assertEqual(await stream.__anext__(), ': keep-alive\n\n')
+        await stream.aclose()
+        self.assertFalse(broker.subscribers)
+
+    async def test_abandoned_stream_releases_subscription(self):
+        # A server writing into a dropped connection keeps consuming the stream
+        broker = events.InProcessBroker()
+        subscription, replay = broker.subscribe()
+        chunks = [chunk async for chunk in events.stream(subscription, replay, heartbeat=0.01, max_age=0.05)]
+        self.assertEqual(chunks[0], 'retry: 3000\n\n')
+        self.assertTrue(set(chunks[1:]) <= {': keep-alive\n\n'})
+        self.assertFalse(broker.subscribers)
+
+    def test_writes_publish_after_commit(self):
+        broker = events.get_broker()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = BlogPost.objects.create(title='Live', content='Body', author=self.user)
+            self.assertEqual(broker.last_id, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.toggle_like(post.pk, self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.likes.remove(self.user)
+        post_id, created = post.pk, events.post_created_data(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual([(event.type, event.data) for event in broker.buffer], [
+            (events.POST_CREATED, created),
+            (events.LIKE_COUNT_CHANGED, {'id': post_id, 'like_count': 1}),
+            (events.LIKE_COUNT_CHANGED, {'id': post_id, 'like_count': 0}),
+            (events.POST_DELETED, {'id': post_id, 'author': self.user.pk}),
+        ])
+
+    async def test_endpoint_streams_under_asgi(self):
+        broker = events.get_broker()
+        broker.publish(events.POST_CREATED, {'id': 1})
+        broker.publish(events.POST_DELETED, {'id': 1})
+        response = await self.async_client.get(reverse('events'), headers={'Last-Event-ID': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await content.__anext__(), b'retry: 3000\n\n')
+        self.assertTrue((await content.__anext__()).startswith(b'id: 2\nevent: post-deleted\n'))
+        broker.publish(events.POST_CREATED, {'id': 2})
+        self.assertTrue((await content.__anext__()).startswith(b'id: 3\nevent: post-created\n'))
+        await content.aclose()
+
+    def test_endpoint_needs_asgi(self):
+        self.assertEqual(self.client.get(reverse('events')).status_code, 503)
+
+
+# for the write-behind like buffer
+@override_settings(BLOG_LIKE_BUFFER={'ENABLED': True, 'MAX_PENDING': 100, 'INTERVAL': 0})
+class LikeBufferTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='liker', password='testpass123')
+        self.post = BlogPost.objects.create(title='Storm', content='Body', author=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.buffer = likebuffer.get_like_buffer()
+
+    def like(self):
+        return self.client.post(reverse('blog-post-like', kwargs={'post_id': self.post.pk})).json()
+
+    def test_toggle_while_batch_in_flight(self):
+        # The in-flight state is used as is, with no like row read that a finishing
+        # flush could race with
+        key = (self.user.pk, self.post.pk)
+        self.buffer.inflight.set(key, False, True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(likebuffer.toggle_like(self.post.pk, self.user), (False, 0))
+        self.assertEqual(len(queries), 1)
+        self.buffer.inflight = likebuffer.LikeJournal()
+        self.assertEqual(self.buffer.pending.get(key), (True, False))
+
+    def test_flush_that_lands_while_reading_the_like_row(self):
+        # Another toggle for the same pair is flushed between the read and the locked check
+        read_stored = self.buffer.stored
+
+        def racing_read(key):
+            stored = read_stored(key)
+            self.buffer.stored = read_stored
+            likebuffer.toggle_like(self.post.pk, self.user)
+            self.buffer.flush()
+            return stored
+
+        self.buffer.stored = racing_read
+        self.assertEqual(likebuffer.toggle_like(self.post.pk, self.user), (False, 0))
+        self.buffer.flush()
+        self.assertFalse(self.post.likes.exists())
+
+    def test_flush_notifies_after_commit(self):
+        version = get_list_version(self.user.pk)
+        with self.settings(BLOG_EVENTS={**settings.BLOG_EVENTS, 'ENABLED': True}), \
+                mock.patch.object(events, 'publish') as publish:
+            likebuffer.toggle_like(self.post.pk, self.user)
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.buffer.flush()
+            self.assertEqual(get_list_version(self.user.pk), version)
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        self.assertNotEqual(get_list_version(self.user.pk), version)
+        publish.assert_called_once_with(events.LIKE_COUNT_CHANGED, {'id': self.post.pk, 'like_count': 1})
+
+    def test_toggle_is_buffered_and_overlaid(self):
+        self.assertEqual(self.like(), {'status': 'post liked', 'like_count': 1})
+        self.assertFalse(self.post.likes.exists())
+        [listed] = self.client.get(reverse('blog-post-list')).json()
+        self.assertTrue(listed['liked_by_me'])
+        self.assertEqual(listed['like_count'], 1)
+        detail = self.client.get(reverse('blog-post-detail', kwargs={'pk': self.post.pk})).json()
+        self.assertEqual((detail['like_count'], detail['liked_by_me']), (1, True))
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertTrue(self.post.likes.filter(pk=self.user.pk).exists())
+        self.assertIsNone(self.buffer.count_overlay())
+        self.assertEqual(self.client.get(reverse('blog-post-list')).json()[0]['like_count'], 1)
+
+        # Unliking a stored like is buffered the same way
+        self.assertEqual(self.like(), {'status': 'post unliked', 'like_count': 0})
+        self.assertFalse(self.client.get(reverse('blog-post-list')).json()[0]['liked_by_me'])
+        self.buffer.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(self.post.likes.exists())
+
+    def test_repeated_toggles_cancel_out(self):
+        for _ in range(4):
+            self.like()
+        self.assertEqual(len(self.buffer.pending), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_storm_is_written_in_one_batch(self):
+        fans = User.objects.bulk_create([User(username=f'fan{i}') for i in range(50)])
+        with CaptureQueriesContext(connection) as queries:
+            for fan in fans:
+                likebuffer.toggle_like(self.post.pk, fan)
+        self.assertFalse([q for q in queries if not q['sql'].startswith('SELECT')])
+        self.assertEqual(likebuffer.toggle_like(self.post.pk, self.user), (True, 51))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 51)
+        # Plus the two-query rebuild of the author's stats
+        self.assertLessEqual(len(queries), 8)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 51)
+        self.assertEqual(self.post.likes.count(), 51)
+
+    @override_settings(BLOG_LIKE_BUFFER={'ENABLED': True, 'MAX_PENDING': 2, 'INTERVAL': 0})
+    def test_flushes_at_max_pending(self):
+        other = BlogPost.objects.create(title='Other', content='Body', author=self.user)
+        likebuffer.toggle_like(self.post.pk, self.user)
+        self.assertFalse(BlogPost.likes.through.objects.exists())
+        likebuffer.toggle_like(other.pk, self.user)
+        self.assertEqual(BlogPost.likes.through.objects.count(), 2)
+        with self.assertRaises(BlogPost.DoesNotExist):
+            likebuffer.toggle_like(0, self.user)
+
+
+# for read-replica routing and read-your-writes pinning
+@override_settings(BLOG_DB_ROUTING={'REPLICAS': ['replica1', 'replica2'], 'PIN_SECONDS': 5, 'PIN_CACHE': 'default'})
+class DatabaseRoutingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_round_robin_and_writes_go_to_primary(self):
+        reads = [self.router.db_for_read(BlogPost) for _ in range(4)]
+        self.assertEqual(reads, ['replica1', 'replica2', 'replica1', 'replica2'])
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_write(BlogPost), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'blog'))
+        self.assertIsNone(self.router.allow_migrate('default', 'blog'))
+        with override_settings(BLOG_DB_ROUTING={'REPLICAS': []}):
+            self.assertIsNone(self.router.db_for_read(BlogPost))
+
+    def test_request_reads_its_writes_and_pins_client(self):
+        router = self.router
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(BlogPost))
+            if request.method == 'POST':
+                router.db_for_write(BlogPost)
+                seen.append(router.db_for_read(BlogPost))
+            return HttpResponse()
+
+        middleware = ReadYourWritesMiddleware(view)
+        factory = RequestFactory()
+        middleware(factory.get('/', HTTP_AUTHORIZATION='Token a'))
+        middleware(factory.post('/', HTTP_AUTHORIZATION='Token a'))
+        self.assertEqual(seen[1:], ['replica2', 'default'])
+        # The writer stays on the primary, other clients do not
+        seen.clear()
+        middleware(factory.get('/', HTTP_AUTHORIZATION='Token a'))
+        middleware(factory.get('/', HTTP_AUTHORIZATION='Token b'))
+        middleware(factory.post('/'))
+        middleware(factory.get('/'))
+        self.assertEqual(seen[0], 'default')
+        self.assertIn(seen[1], ('replica1', 'replica2'))
+        self.assertNotEqual(seen[-1], 'default')
+        # Outside a request nothing is pinned
+        self.assertNotEqual(router.db_for_read(BlogPost), 'default')
+
+
+# for the streaming export of a user's posts
+class BlogPostExportTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='testpass123')
+        other = User.objects.create_user(username='other', password='testpass123')
+        BlogPost.objects.create(title='Not mine', content='Body', author=other)
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content=f'Line one\nline "two" {i}, é', author=self.user)
+            for i in range(3)
+        ]
+        self.client.force_authenticate(user=self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('blog-post-export'), params, HTTP_ACCEPT_ENCODING='identity')
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [post.pk for post in self.posts])
+        expected = BlogPostSerializer(self.posts[0]).data
+        for name in ('title', 'content', 'created_at', 'like_count'):
+            self.assertEqual(rows[0][name], expected[name])
+
+    @override_settings(BLOG_EXPORT={'CHUNK_SIZE': 2, 'BUFFER_SIZE': 64 * 1024})
+    def test_pages_by_keyset(self):
+        # Same created_at for all, so the id breaks the ties between chunks
+        BlogPost.objects.filter(author=self.user).update(created_at=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            _, body = self.export()
+        self.assertEqual([json.loads(line)['id'] for line in body.decode().splitlines()],
+                         [post.pk for post in self.posts])
+        self.assertEqual(len([q for q in queries if 'blog_blogpost' in q['sql']]), 2)
+
+    @override_settings(BLOG_EXPORT={'CHUNK_SIZE': 2, 'BUFFER_SIZE': 64 * 1024})
+    def test_reads_every_page_from_one_database(self):
+        with mock.patch('blog.export.router.db_for_read', return_value='default') as db_for_read:
+            _, body = self.export()
+        self.assertEqual(len(body.decode().splitlines()), 3)
+        db_for_read.assert_called_once()
+
+    @override_settings(BLOG_EXPORT={'CHUNK_SIZE': 2, 'BUFFER_SIZE': 1})
+    async def test_streams_asynchronously_under_asgi(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get(reverse('blog-post-export'), {'output': 'csv'},
+                                               headers={'Authorization': 'Token ' + token.key})
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)
+        rows = list(csv.reader(StringIO(b''.join(chunks).decode())))
+        self.assertEqual([int(row[0]) for row in rows[1:]], [post.pk for post in self.posts])
+
+    def test_csv(self):
+        response, body = self.export(output='csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="posts.csv"')
+        rows = list(csv.reader(StringIO(body.decode())))
+        self.assertEqual(rows[0], ['id', 'title', 'content', 'created_at', 'updated_at', 'like_count'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[3][2], self.posts[2].content)
+
+    def test_gzip_and_errors(self):
+        response = self.client.get(reverse('blog-post-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body, self.export()[1])
+        self.assertEqual(self.client.get(reverse('blog-post-export'), {'output': 'xml'}).status_code, 400)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse('blog-post-export')).status_code, 401)
+
+    @override_settings(BLOG_EXPORT={'CHUNK_SIZE': 2, 'BUFFER_SIZE': 1})
+    def test_streams_before_reading_everything(self):
+        response = self.client.get(reverse('blog-post-export'), {'output': 'csv'})
+        chunks = iter(response.streaming_content)
+        # The CSV header is produced before the query runs
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(next(chunks).startswith(b'id,title'))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(list(chunks)), 3)
+
+
+# for the lean API settings profile and the startup benchmark
+class StartupProfileTestCase(SimpleTestCase):
+
+    def test_lean_profile_serves_api_without_admin(self):
+        probe, _ = benchmarks.run_startup_probe('Assignment2_backend.settings_api', '/api/blogs/')
+        self.assertEqual(probe['status'], '401 Unauthorized')
+        self.assertNotIn('django.contrib.admin', probe['apps'])
+        self.assertNotIn('django.contrib.sessions', probe['apps'])
+        # DRF's schema module imports parts of django.contrib.admin, but the admin app
+        # and its autodiscovery must never load
+        for name in bench_startup.LEAN_FORBIDDEN_MODULES:
+            self.assertNotIn(name, probe['watched_modules'])
+
+    def test_parse_importtime(self):
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |   b\n'
+            'import time:      2000 |       2100 | a\n'
+        )
+        self.assertEqual(benchmarks.parse_importtime(stderr, top=1), {
+            'total_ms': 2.1, 'top': [{'module': 'a', 'cumulative_ms': 2.1}],
+        })
+
+
+# for the password hashing pool
+@override_settings(BLOG_HASHING_POOL={'ENABLED': True, 'WORKERS': 1, 'MAX_QUEUE': 0})
+class PasswordHashingPoolTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='hashuser', password='testpass123')
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def occupy_pool(self):
+        # Holds the only slot of the pool until the test ends
+        return hashing.get_hashing_pool().submit(self.release.wait)
+
+    def test_full_pool_refuses_work(self):
+        pool = hashing.HashingPool(workers=1, max_queue=1)
+        self.addCleanup(pool.shutdown)
+        first, second = pool.submit(self.release.wait), pool.submit(self.release.wait)
+        with self.assertRaises(hashing.HashingBusy):
+            pool.submit(self.release.wait)
+        self.release.set()
+        first.result(), second.result()
+        # Slots are given back as jobs finish
+        self.assertEqual(pool.run(sum, [1, 2]), 3)
+
+    def test_register_and_login_through_pool(self):
+        response = self.client.post(reverse('register'),
+                                    {'username': 'pooled', 'email': 'p@example.com', 'password': 'pooledpass1'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.get(username='pooled').check_password('pooledpass1'))
+        response = self.client.post(reverse('login'), {'username': 'pooled', 'password': 'pooledpass1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.json())
+
+    def test_busy_pool_returns_503(self):
+        self.occupy_pool()
+        response = self.client.post(reverse('login'), {'username': 'hashuser', 'password': 'wrongpass'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        # A refused attempt is not a failed login
+        self.assertFalse(LoginFailureThrottle().cache.get(LoginFailureThrottle().get_key('hashuser')))
+        response = self.client.post(reverse('register'),
+                                    {'username': 'busy', 'email': 'b@example.com', 'password': 'busypass12'},
+                                    format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(User.objects.filter(username='busy').exists())
+
+    def test_upgrades_outdated_hash(self):
+        self.user.password = make_password('testpass123', hasher='pbkdf2_sha1')
+        self.user.save()
+        response = self.client.post(reverse('login'), {'username': 'hashuser', 'password': 'testpass123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha1$'))
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf,
+                   BLOG_HASHING_POOL={'ENABLED': True, 'WORKERS': 1, 'MAX_QUEUE': 0})
+class AsyncAuthViewsTestCase(PasswordHashingPoolTestCase):
+
+    def test_login_errors_match_sync_view(self):
+        for data in ({'username': 'hashuser'}, {'username': 'hashuser', 'password': 'wrongpass'}, ['hashuser']):
+            async_response = self.client.post(reverse('login'), data, format='json')
+            with self.settings(ROOT_URLCONF='Assignment2_backend.urls'):
+                sync_response = self.client.post(reverse('login'), data, format='json')
+            self.assertEqual(async_response.status_code, 400)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+
+# for the incrementally maintained author stats
+class AuthorStatsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='statsauthor', password='testpass123')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='testpass123') for i in range(3)]
+        self.client.force_authenticate(user=self.author)
+
+    def stats(self):
+        return self.client.get(reverse('author-stats')).json()
+
+    def assertStatsVerified(self):
+        self.assertEqual(AuthorStats.objects.verify([self.author.pk]), [])
+
+    def test_user_without_posts(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('author-stats'))
+        self.assertEqual(response.json(), {
+            'post_count': 0, 'likes_received': 0, 'top_post': None, 'top_post_like_count': 0, 'updated_at': None,
+        })
+
+    def test_create_like_and_delete(self):
+        ids = [self.client.post(reverse('blog-post-create'), {'title': f'Post {i}', 'content': 'Body'},
+                                format='json').json()['id'] for i in range(2)]
+        first, second = ids
+        for fan in self.fans:
+            BlogPost.objects.toggle_like(second, fan)
+        BlogPost.objects.toggle_like(first, self.fans[0])
+        with self.assertNumQueries(1):
+            stats = self.stats()
+        self.assertEqual(stats['post_count'], 2)
+        self.assertEqual(stats['likes_received'], 4)
+        self.assertEqual((stats['top_post'], stats['top_post_like_count']), (second, 3))
+
+        # The top post falling level with another hands the title to the older one
+        BlogPost.objects.toggle_like(second, self.fans[1])
+        BlogPost.objects.toggle_like(second, self.fans[2])
+        stats = self.stats()
+        self.assertEqual((stats['top_post'], stats['top_post_like_count']), (first, 1))
+        self.assertStatsVerified()
+
+        response = self.client.delete(reverse('blog-post-delete', kwargs={'pk': first}))
+        self.assertEqual(response.status_code, 204)
+        stats = self.stats()
+        self.assertEqual(stats['post_count'], 1)
+        self.assertEqual(stats['likes_received'], 1)
+        self.assertEqual((stats['top_post'], stats['top_post_like_count']), (second, 1))
+        self.assertStatsVerified()
+
+    def test_batch_create_and_related_managers(self):
+        posts = BlogPost.objects.create_batch(self.author, [{'title': f'P{i}', 'content': 'Body'} for i in range(3)])
+        self.assertEqual(self.stats()['post_count'], 3)
+        posts[1].likes.add(*self.fans)
+        self.fans[0].liked_posts.add(posts[2])
+        self.assertStatsVerified()
+        self.assertEqual(self.stats()['top_post'], posts[1].pk)
+        posts[1].likes.clear()
+        self.assertEqual(self.stats()['top_post'], posts[2].pk)
+        self.assertStatsVerified()
+
+    def test_rolled_back_write_leaves_stats_alone(self):
+        post = BlogPost.objects.create(title='Kept', content='Body', author=self.author)
+        try:
+            with transaction.atomic():
+                BlogPost.objects.toggle_like(post.pk, self.fans[0])
+                BlogPost.objects.create(title='Gone', content='Body', author=self.author)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        stats = self.stats()
+        self.assertEqual((stats['post_count'], stats['likes_received'], stats['top_post']), (1, 0, None))
+
+    @override_settings(BLOG_LIKE_BUFFER={'ENABLED': True, 'MAX_PENDING': 100, 'INTERVAL': 0})
+    def test_like_buffer_flush(self):
+        post = BlogPost.objects.create(title='Buffered', content='Body', author=self.author)
+        for fan in self.fans:
+            likebuffer.toggle_like(post.pk, fan)
+        self.assertEqual(self.stats()['likes_received'], 0)
+        likebuffer.get_like_buffer().flush()
+        stats = self.stats()
+        self.assertEqual((stats['likes_received'], stats['top_post']), (3, post.pk))
+
+    def test_rebuild_command_verifies_and_repairs(self):
+        post = BlogPost.objects.create(title='Drift', content='Body', author=self.author)
+        BlogPost.objects.toggle_like(post.pk, self.fans[0])
+        out = StringIO()
+        call_command('rebuild_author_stats', '--verify', stdout=out)
+        self.assertIn(f'Verified the stats of {User.objects.count()} users.', out.getvalue())
+
+        AuthorStats.objects.filter(pk=self.author.pk).update(likes_received=7, top_post=None)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_author_stats', '--verify', '--batch-size', '2', stdout=StringIO())
+        call_command('rebuild_author_stats', '--batch-size', '2', stdout=StringIO())
+        self.assertStatsVerified()
+        self.assertEqual(self.stats()['likes_received'], 1)
@@ -0,0 +1,41 @@
+# throttling.py - Throttles for the blog API
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LoginFailureThrottle:
+    """
+    Counts failed logins per username in the cache. Once a username reaches
+    ``MAX_FAILURES`` within ``WINDOW`` seconds further attempts are rejected before
+    any password hashing happens, so a brute-force flood costs a cache lookup per
+    request instead of a full hash.
+    """
+    key_prefix = 'blog:login-failures:'
+
+    def __init__(self):
+        options = settings.BLOG_LOGIN_THROTTLE
+        self.max_failures = options['MAX_FAILURES']
+        self.window = options['WINDOW']
+        self.cache = caches[options.get('ALIAS', 'default')]
+
+    def get_key(self, username):
+        return self.key_prefix + hashlib.sha256(username.encode()).hexdigest()
+
+    def is_blocked(self, username):
+        if not self.max_failures:
+            return False
+        return self.cache.get(self.get_key(username), 0) >= self.max_failures
+
+    def record_failure(self, username):
+        key = self.get_key(username)
+        # The window starts with the first failure and is not extended by later ones
+        if not self.cache.add(key, 1, self.window):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, self.window)
+
+    def reset(self, username):
+        self.cache.delete(self.get_key(username))
@@ -1,15 +1,34 @@
 from django.urls import path
 from blog.views import RegisterView, LoginView, LogoutView, BlogPostCreateView, BlogPostListView, BlogPostDeleteView, \
-    LikePostView
+    LikePostView, BlogPostUpdateView, BlogPostBatchCreateView, BlogPostSearchView, \
+    FeedView, MetricsView, TrendingView, BlogPostDetailView, BlogPostExportView, AuthorStatsView, EventStreamView
+from django.conf import settings
 from . import views
 
+if settings.BLOG_ASYNC_VIEWS:
+    # Serve the hot endpoints with native async views when running under ASGI; only
+    # imported then, so WSGI deployments never load them
+    from blog.async_views import AsyncBlogPostCreateView as BlogPostCreateView, \
+        AsyncBlogPostListView as BlogPostListView, AsyncLikePostView as LikePostView, \
+        AsyncRegisterView as RegisterView, AsyncLoginView as LoginView
+
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('create/', BlogPostCreateView.as_view(), name='blog-post-create'),
+    path('create/batch/', BlogPostBatchCreateView.as_view(), name='blog-post-batch-create'),
     path('blogs/', BlogPostListView.as_view(), name='blog-post-list'),
+    path('blogs/search/', BlogPostSearchView.as_view(), name='blog-post-search'),
+    path('blogs/export/', BlogPostExportView.as_view(), name='blog-post-export'),
+    path('blogs/<int:pk>/', BlogPostDetailView.as_view(), name='blog-post-detail'),
+    path('blogs/<int:pk>/edit/', BlogPostUpdateView.as_view(), name='blog-post-edit'),
     path('blogs/<int:pk>/delete/', BlogPostDeleteView.as_view(), name='blog-post-delete'),
     path('blogs/<int:post_id>/like/', LikePostView.as_view(), name='blog-post-like'),
+    path('feed/', FeedView.as_view(), name='feed'),
+    path('me/stats/', AuthorStatsView.as_view(), name='author-stats'),
+    path('trending/', TrendingView.as_view(), name='trending'),
+    path('events/', EventStreamView.as_view(), name='events'),
+    path('_metrics', MetricsView.as_view(), name='metrics'),
 
 ]
\ No newline at end of file
@@ -1,14 +1,42 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.authtoken.models import Token
-from django.contrib.auth import authenticate
-from .serializers import RegisterSerializer, LoginSerializer, BlogPostSerializer
-from .models import BlogPost
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from . import conditional
+from .cache import PostListCache
+from .middleware import select_encoding
+from .serializers import RegisterSerializer, LoginSerializer, BlogPostSerializer, AuthorStatsSerializer, \
+    defer_unrequested, get_requested_fields, serialize_posts
+from .models import AuthorStats, BlogPost
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
+from .permissions import CanReadMetrics
+from .throttling import LoginFailureThrottle
+from rest_framework.parsers import JSONParser
+from rest_framework import status
+
+# The modules behind optional features (the fast path and its orjson, search, the
+# feed timeline, the like buffer, metrics) are imported by the views that use them,
+# so a cold start only loads what its first request needs.
+
+
+class FastPathRendererMixin:
+    """
+    Puts fastpath.FastJSONRenderer first for JSON responses while the fast path is
+    enabled.
+    """
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if settings.BLOG_FAST_PATH['ENABLED']:
+            from .fastpath import FastJSONRenderer
+            renderers.insert(0, FastJSONRenderer())
+        return renderers
+
 
 # Register a new user
 class RegisterView(APIView):
@@ -24,12 +52,28 @@ class RegisterView(APIView):
 
 # User login view
 class LoginView(APIView):
+    # A stale token header must not block logging in again
+    authentication_classes = []
     permission_classes = [AllowAny]
 
     def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response({'non_field_errors': ['Invalid data. Expected a dictionary.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        username = str(request.data.get('username', ''))
+        throttle = LoginFailureThrottle()
+        if throttle.is_blocked(username):
+            # Rejected before any password hashing happens
+            return Response({'detail': 'Too many failed login attempts. Try again later.'},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS,
+                            headers={'Retry-After': str(throttle.window)})
+
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
+            throttle.reset(username)
             return Response(serializer.validated_data, status=status.HTTP_200_OK)
+        if 'non_field_errors' in serializer.errors:
+            throttle.record_failure(username)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -53,35 +97,67 @@ class BlogPostCreateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        serializer = BlogPostSerializer(data=request.data, context={'request': request})
-        data = request.data.copy()
-        data['author'] = request.user.id
-        serializer = BlogPostSerializer(data=data)
-
+        # A new post has no likes yet, so liked_by_me needs no lookup
+        serializer = BlogPostSerializer(data=request.data, context={'request': request, 'liked_post_ids': set()})
         if serializer.is_valid():
             serializer.save(author=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-            post = serializer.save()
-            return Response({
-                'id': post.id,
-                'title': post.title,
-                'content': post.content,
-                'author': post.author.username,
-            }, status=status.HTTP_201_CREATED)
-
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class BlogPostListView(APIView):
+# Create many blog posts at once
+class BlogPostBatchCreateView(APIView):
     """
-    API endpoint for listing all blog posts of the authenticated user.
+    API endpoint for creating blog posts in bulk, e.g. when importing a user.
+
+    Accepts a JSON array or an NDJSON body (one post per line). The whole batch is
+    validated first: if any item is invalid nothing is written and the errors are
+    returned per item, in order. Otherwise the posts are inserted with bulk_create
+    in chunks inside one transaction and their ids are returned in order.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of posts.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = settings.BLOG_BATCH_CREATE['MAX_SIZE']
+        if len(items) > max_size:
+            return Response({'detail': f'A batch may contain at most {max_size} posts.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BlogPostSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'results': [{'errors': errors} for errors in serializer.errors]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        posts = BlogPost.objects.create_batch(
+            request.user, serializer.validated_data, batch_size=settings.BLOG_BATCH_CREATE['CHUNK_SIZE']
+        )
+        return Response({'results': [{'id': post.id} for post in posts]}, status=status.HTTP_201_CREATED)
+
+# Full-text search over the authenticated user's blog posts
+class BlogPostSearchView(APIView):
+    """
+    API endpoint for searching the authenticated user's posts by title and content.
+
+    ``?q=`` is matched against a full-text index (Postgres tsvector/GIN, SQLite
+    FTS5) and results come back best match first, paginated with ``cursor`` and
+    ``page_size`` like the post list.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Retrieve blog posts for authenticated user
-        blog_posts = BlogPost.objects.filter(author=request.user)
-        serializer = BlogPostSerializer(blog_posts, many=True)
-        return Response(serializer.data)
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'detail': 'The q parameter is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        from .search import SearchPagination
+
+        paginator = SearchPagination()
+        page = paginator.search(query, request.user, request)
+        serializer = BlogPostSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
 
 class BlogPostUpdateView(APIView):
     """
@@ -90,24 +166,169 @@ class BlogPostUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, pk):
-        try:
-            blog_post = BlogPost.objects.get(pk=pk, author=request.user)
-        except BlogPost.DoesNotExist:
-            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = BlogPostSerializer(blog_post, data=request.data, partial=True, context={'request': request})
-        if serializer.is_valid():
+        # Locked on the primary (reads inside a transaction are never routed to a
+        # replica), so a lagging replica's like_count cannot be written back
+        with transaction.atomic():
+            try:
+                blog_post = BlogPost.objects.select_for_update().get(pk=pk, author=request.user)
+            except BlogPost.DoesNotExist:
+                return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+            serializer = BlogPostSerializer(blog_post, data=request.data, partial=True, context={'request': request})
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data)
+
+    def patch(self, request, pk):
+        # put() already applies partial updates
+        return self.put(request, pk)
 
 # List blog posts by the authenticated user
-class BlogPostListView(APIView):
+class BlogPostListView(FastPathRendererMixin, APIView):
+    """
+    API endpoint for listing all blog posts of the authenticated user.
+
+    Passing ``cursor`` and/or ``page_size`` switches to keyset pagination, which
+    returns ``{'next', 'previous', 'results'}`` instead of the full list.
+    ``?view=summary`` (or ``?fields=a,b``) returns the stored excerpt and length
+    instead of the content, which is then never read from the database.
+    Responses are cached per user and carry an ETag and Last-Modified, so polling
+    clients sending ``If-None-Match`` get a 304 without the list being rebuilt.
+    With the cache disabled the validators come from one aggregate query instead.
+    """
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self, request):
+        if not settings.BLOG_LIST_CACHE['ENABLED']:
+            if conditional.has_conditions(request):
+                etag, last_modified = conditional.get_validators(self.get_validation_queryset(request), request)
+                not_modified = conditional.not_modified(request, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+            data, (etag, last_modified) = self.get_list_data(request)
+            return conditional.set_validators(Response(data, status=status.HTTP_200_OK), etag, last_modified)
+
+        list_cache = PostListCache(request)
+        not_modified = conditional.not_modified(request, list_cache.etag, list_cache.last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        data = list_cache.get()
+        if data is None:
+            data, _ = self.get_list_data(request)
+            list_cache.set(data)
+        response = Response(data, status=status.HTTP_200_OK)
+        return conditional.set_validators(response, list_cache.etag, list_cache.last_modified)
+
+    def get_validation_queryset(self, request):
+        # The rows get_list_data would load, look-ahead row included
         blog_posts = BlogPost.objects.filter(author=request.user)
-        serializer = BlogPostSerializer(blog_posts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            return paginator.get_page_queryset(blog_posts, request)
+        return blog_posts
+
+    def get_list_data(self, request):
+        """
+        Returns ``(data, (etag, last_modified))``, the validators computed from the
+        loaded rows.
+        """
+        fields = get_requested_fields(request)
+        blog_posts = defer_unrequested(BlogPost.objects.filter(author=request.user), fields)
+        if settings.BLOG_FAST_PATH['ENABLED']:
+            from . import fastpath
+            return fastpath.get_list_data(blog_posts, request, fields=fields)
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            page = paginator.paginate_queryset(blog_posts, request)
+            data = paginator.get_paginated_data(serialize_posts(page, fields, {'request': request}))
+            return data, conditional.get_row_validators(paginator.window, request)
+
+        blog_posts = list(blog_posts)
+        return serialize_posts(blog_posts, fields, {'request': request}), \
+            conditional.get_row_validators(blog_posts, request)
+
+class FeedView(APIView):
+    """
+    Public feed of the newest posts from all authors, newest first, always paginated
+    with ``cursor`` / ``page_size``. Pages come from the precomputed timeline in
+    ``blog.feed`` rather than sorting the posts table on every request.
+    Conditional requests are answered from one aggregate over the page's posts.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        from .feed import FeedPagination
+
+        fields = get_requested_fields(request)
+        paginator = FeedPagination()
+        paginator.prepare(request)
+        if conditional.has_conditions(request):
+            etag, last_modified = conditional.get_validators(paginator.get_window_queryset(), request)
+            not_modified = conditional.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+        page = paginator.paginate_feed(request, defer_unrequested(BlogPost.objects.all(), fields))
+        response = paginator.get_paginated_response(serialize_posts(page, fields, {'request': request}))
+        return conditional.set_validators(response, *conditional.get_row_validators(paginator.window, request))
+
+
+class TrendingView(FastPathRendererMixin, APIView):
+    """
+    Public list of the ``limit`` (default BLOG_PAGE_SIZE) highest ranked posts by
+    trending score. Scores are maintained as likes change, so this is a single
+    index-ordered query.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', settings.BLOG_PAGE_SIZE))
+        except ValueError:
+            limit = settings.BLOG_PAGE_SIZE
+        limit = min(max(limit, 1), settings.BLOG_MAX_PAGE_SIZE)
+        fields = get_requested_fields(request)
+        if conditional.has_conditions(request):
+            etag, last_modified = conditional.get_validators(BlogPost.objects.trending(limit), request)
+            not_modified = conditional.not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        posts = defer_unrequested(BlogPost.objects.trending(limit), fields)
+        if settings.BLOG_FAST_PATH['ENABLED']:
+            from . import fastpath
+            data, validators = fastpath.get_list_data(posts, request, paginate=False, fields=fields)
+        else:
+            posts = list(posts)
+            data, validators = serialize_posts(posts, fields, {'request': request}), \
+                conditional.get_row_validators(posts, request)
+        return conditional.set_validators(Response(data), *validators)
+
+
+class BlogPostDetailView(APIView):
+    """
+    Public endpoint returning one post with its full content, for clients that list
+    posts in summary mode. Supports conditional GET on ``updated_at``.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        if conditional.has_conditions(request):
+            updated_at = BlogPost.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+            if updated_at is None:
+                return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+            etag = conditional.make_etag(1, updated_at, pk, request)
+            not_modified = conditional.not_modified(request, etag, updated_at)
+            if not_modified is not None:
+                return not_modified
+        try:
+            blog_post = BlogPost.objects.get(pk=pk)
+        except BlogPost.DoesNotExist:
+            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
+        response = Response(BlogPostSerializer(blog_post, context={'request': request}).data)
+        return conditional.set_validators(response, *conditional.get_row_validators([blog_post], request, single=True))
+
 
 class BlogPostDeleteView(APIView):
     permission_classes = [IsAuthenticated]
@@ -123,21 +344,116 @@ class BlogPostDeleteView(APIView):
         return Response({"detail": "Blog post deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+class AuthorStatsView(APIView):
+    """
+    The user's post count, likes received and most liked post. Every write keeps
+    the AuthorStats row current, so this is one primary key lookup. Users who have
+    never posted have no row and get zeros.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            stats = AuthorStats.objects.get(pk=request.user.pk)
+        except AuthorStats.DoesNotExist:
+            stats = AuthorStats(user=request.user, updated_at=None)
+        return Response(AuthorStatsSerializer(stats).data)
+
+
+class BlogPostExportView(APIView):
+    """
+    Streams all of the user's posts as NDJSON (default) or CSV with ``?output=csv``,
+    gzip-compressed on the fly when the client accepts it. Rows are read and encoded
+    as the response is written, so memory stays flat however many posts there are.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Imported here so the rarely used export stays out of every cold start
+        from django.core.handlers.asgi import ASGIRequest
+        from . import export
+
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.CONTENT_TYPES:
+            return Response({'detail': 'output must be one of: ndjson, csv.'}, status=status.HTTP_400_BAD_REQUEST)
+        compress = select_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), ['gzip']) == 'gzip'
+
+        # Under ASGI a sync iterator would be read into a list before the first byte is sent
+        stream = export.astream_export if isinstance(request._request, ASGIRequest) else export.stream_export
+        response = StreamingHttpResponse(stream(request.user, output, compress),
+                                         content_type=export.CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="posts.{output}"'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
 class LikePostView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure only authenticated users can like the post
 
     def post(self, request, post_id):
+        from . import likebuffer
+
+        # Toggle the like and return the new total so clients don't need to refetch
         try:
-            post = BlogPost.objects.get(id=post_id)
+            liked, like_count = likebuffer.toggle_like(post_id, request.user)
         except BlogPost.DoesNotExist:
             return Response({'detail': 'Post not found.'}, status=404)
 
-        # Check if the user has already liked the post
-        if post.likes.filter(id=request.user.id).exists():
-            post.likes.remove(request.user)
-            return Response({'status': 'post unliked'})
-        else:
-            post.likes.add(request.user)
-            return Response({'status': 'post liked'})
-        print("Looking for post ID:", post_id)
-        print("Available posts:", BlogPost.objects.all())
+        return Response({
+            'status': 'post liked' if liked else 'post unliked',
+            'like_count': like_count,
+        })
+
+
+class MetricsView(APIView):
+    """
+    Prometheus text exposition of the request histograms collected by
+    InstrumentationMiddleware in this worker process. Staff users and scrapers
+    holding the ``BLOG_METRICS['TOKEN']`` bearer secret only.
+    """
+    permission_classes = [CanReadMetrics]
+
+    def get(self, request):
+        from .instrumentation import registry
+
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class EventStreamView(View):
+    """
+    Public server-sent events stream of post-created, post-deleted and
+    like-count-changed events. Only served under ASGI, where an open stream is a
+    suspended coroutine instead of a blocked worker thread.
+    """
+
+    async def get(self, request):
+        from django.core.handlers.asgi import ASGIRequest
+        from . import events
+
+        if not isinstance(request, ASGIRequest) or not settings.BLOG_EVENTS['ENABLED']:
+            return JsonResponse({'detail': 'Event stream is not available.'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            subscription, replay = events.get_broker().subscribe(self.get_last_event_id(request))
+        except events.TooManySubscribers:
+            return JsonResponse({'detail': 'Too many open event streams.'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '30'})
+
+        options = settings.BLOG_EVENTS
+        response = StreamingHttpResponse(
+            events.stream(subscription, replay, options.get('HEARTBEAT', 15), options.get('MAX_AGE')),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def get_last_event_id(self, request):
+        # EventSource sends the header on reconnect; the query parameter covers a first connect
+        value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            return int(value) if value else None
+        except ValueError:
+            return None